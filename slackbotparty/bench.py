@@ -0,0 +1,247 @@
+"""Offline benchmark: runs bots from main.py against local stand-ins.
+
+    python slackbotparty/bench.py --rate 50 --duration 30
+
+Starts fake Slack Web API/Socket Mode, chat API and webhook relay servers
+on local ports, builds the bots from bot_definitions/all.json pointed at
+them (no secrets.json needed), then drives app_mention, message and
+webhook events at a fixed rate. Each event carries a marker that shows up
+in the bot's reply, so end-to-end latency is measured from the moment the
+event is sent to the chat.postMessage that answers it. Socket Mode ack
+latency and RSS growth are reported too.
+
+The stand-ins run in the same process and event loop as the bots, so the
+numbers are for comparing runs on the same machine, not absolute capacity.
+Use --max-p99-ms, --max-rss-growth-mb and --max-lost to fail (exit 1) on
+regressions.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import re
+import resource
+import time
+
+from bot_utils.log import configure_logging
+from bot_utils.resources import ResourceHub
+from main import load_options, build_bot
+from stubs.local import LocalStubs
+
+MARKER = re.compile(r'(?:bench-|UBENCH)(\d+)')
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # peak rather than current, but still shows growth
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Bench():
+    def __init__(self, args):
+        self.args = args
+        self.stubs = LocalStubs(args.slack_delay, args.llm_delay, args.llm_first_token_delay, on_call=self.on_call)
+        self.slack = self.stubs.slack
+        self.relay = self.stubs.relay
+        self.resources = ResourceHub()
+        self.channels = [f"CBENCH{i:04d}" for i in range(args.channels)]
+        self.sent = {}
+        self.replied = {}
+        self.ack_latencies = []
+        self.unmatched = 0
+        self.bots = []
+
+    def on_call(self, method: str, params: dict):
+        if method != "chat.postMessage":
+            return
+        match = MARKER.search(params.get("text") or "")
+        if match is None:
+            self.unmatched += 1
+            return
+        n = int(match.group(1))
+        if n in self.sent and n not in self.replied:
+            self.replied[n] = time.monotonic()
+
+    async def start(self):
+        await self.stubs.start()
+        options = load_options()
+        for name in self.args.bots.split(","):
+            self.bots.append(build_bot(self.stubs.bot_options(options[name]), self.stubs.bot_secrets(name),
+                                       self.resources))
+        self.tasks = [asyncio.create_task(bot.start_async()) for bot in self.bots]
+
+        # bots that listen on Socket Mode get mentions; those that also reply
+        # to everything get plain messages; webhook bots get webhooks
+        self.targets = {"mention": [], "message": [], "webhook": []}
+        for bot in self.bots:
+            if hasattr(bot, "webhook_queue"):
+                self.targets["webhook"].append(bot)
+                continue
+            await asyncio.wait_for(self.slack.wait_connected(bot._options["SLACK_APP_TOKEN"]), 10)
+            self.targets["mention"].append(bot)
+            if bot._options.get("watch_all_messages") and bot._options.get("can_reply_to_all_messages"):
+                self.targets["message"].append(bot)
+
+    async def send(self, n: int, kind: str, bot):
+        channel = random.choice(self.channels)
+        user = f"UBENCH{n}"
+        self.sent[n] = time.monotonic()
+        if kind == "webhook":
+            self.relay.push({"channel": channel, "message": f"alert bench-{n} fired"})
+            return
+        if kind == "mention":
+            identity = self.slack.identity(bot._options["SLACK_BOT_TOKEN"])
+            text = f"<@{identity['user_id']}> bench-{n} how's it going?"
+        else:
+            text = f"bench-{n} anyone around?"
+        event = {"type": "app_mention" if kind == "mention" else "message", "user": user, "text": text,
+                 "channel": channel, "ts": f"{time.time():.6f}", "client_msg_id": f"bench-{n}"}
+        ack = await self.slack.send_event(bot._options["SLACK_APP_TOKEN"], event)
+        sent = self.sent[n]
+        ack.add_done_callback(lambda f: self.ack_latencies.append(f.result() - sent))
+
+    async def drive(self):
+        mix = []
+        for part in self.args.mix.split(","):
+            kind, _, weight = part.partition("=")
+            if self.targets.get(kind):
+                mix.extend([kind] * int(weight or 1))
+        if not mix:
+            raise SystemExit("None of the bots can receive the event kinds in --mix")
+        bots = {kind: itertools.cycle(targets) for kind, targets in self.targets.items() if targets}
+
+        total = int(self.args.rate * self.args.duration)
+        started = time.monotonic()
+        for n in range(total):
+            # open loop: keep to the schedule even if the bots fall behind
+            delay = started + n / self.args.rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = random.choice(mix)
+            await self.send(n, kind, next(bots[kind]))
+        return time.monotonic() - started
+
+    async def settle(self):
+        deadline = time.monotonic() + self.args.settle
+        while len(self.replied) < len(self.sent) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.resources.close()
+        await self.stubs.close()
+
+    def report(self, elapsed: float, rss_start: float, rss_peak: float, rss_end: float) -> dict:
+        latencies = [(self.replied[n] - self.sent[n]) * 1000 for n in self.replied]
+        last_reply = max(self.replied.values(), default=0)
+        first_sent = min(self.sent.values(), default=0)
+        window = max(last_reply - first_sent, elapsed) or 1
+        return {
+            "bots": self.args.bots.split(","),
+            "offered_rate": self.args.rate,
+            "sent": len(self.sent),
+            "send_rate": round(len(self.sent) / elapsed, 1) if elapsed else 0,
+            "replied": len(self.replied),
+            "lost": len(self.sent) - len(self.replied),
+            "unmatched_posts": self.unmatched,
+            "events_per_sec": round(len(self.replied) / window, 1),
+            "latency_ms": {"p50": round(percentile(latencies, 50), 1), "p99": round(percentile(latencies, 99), 1),
+                           "max": round(max(latencies, default=0), 1)},
+            "ack_ms": {"p50": round(percentile(self.ack_latencies, 50) * 1000, 1),
+                       "p99": round(percentile(self.ack_latencies, 99) * 1000, 1)},
+            "rss_mb": {"start": round(rss_start, 1), "peak": round(rss_peak, 1), "end": round(rss_end, 1),
+                       "growth": round(rss_end - rss_start, 1)},
+            "slack_api_calls": self.slack.stats["calls"],
+        }
+
+
+async def run(args) -> dict:
+    bench = Bench(args)
+    await bench.start()
+    await asyncio.sleep(args.warmup)
+    rss_start = rss_peak = rss_mb()
+
+    async def sample():
+        nonlocal rss_peak
+        while True:
+            rss_peak = max(rss_peak, rss_mb())
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.create_task(sample())
+    try:
+        elapsed = await bench.drive()
+        await bench.settle()
+    finally:
+        sampler.cancel()
+        rss_end = rss_mb()
+        await bench.stop()
+    return bench.report(elapsed, rss_start, max(rss_peak, rss_end), rss_end)
+
+
+def print_report(result: dict):
+    print(f"bots:        {', '.join(result['bots'])}")
+    print(f"sent:        {result['sent']} events at {result['send_rate']}/s (offered {result['offered_rate']}/s)")
+    print(f"replied:     {result['replied']} ({result['lost']} lost, {result['unmatched_posts']} other posts)")
+    print(f"throughput:  {result['events_per_sec']} events/s")
+    latency = result["latency_ms"]
+    print(f"end-to-end:  p50 {latency['p50']}ms  p99 {latency['p99']}ms  max {latency['max']}ms")
+    print(f"socket ack:  p50 {result['ack_ms']['p50']}ms  p99 {result['ack_ms']['p99']}ms")
+    rss = result["rss_mb"]
+    print(f"rss:         {rss['start']}MB -> {rss['end']}MB (peak {rss['peak']}MB, growth {rss['growth']}MB)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the bots against local Slack, LLM and webhook stand-ins")
+    parser.add_argument("--bots", default="Dexter,Poppy,Louie", help="comma-separated bot names from all.json")
+    parser.add_argument("--rate", type=float, default=20, help="events per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to send events for")
+    parser.add_argument("--mix", default="mention=1,message=1,webhook=1", help="relative weight of event kinds")
+    parser.add_argument("--channels", type=int, default=100, help="channels to spread events over")
+    parser.add_argument("--warmup", type=float, default=1, help="seconds to wait after startup")
+    parser.add_argument("--settle", type=float, default=10, help="seconds to wait for outstanding replies")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="stub chat API delay per streamed word")
+    parser.add_argument("--llm-first-token-delay", type=float, default=0.05)
+    parser.add_argument("--slack-delay", type=float, default=0.0, help="stub Slack API delay per call")
+    parser.add_argument("--log-dir", default="logs/bench")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p99-ms", type=float, help="exit 1 if p99 end-to-end latency is above this")
+    parser.add_argument("--max-rss-growth-mb", type=float, help="exit 1 if RSS grows by more than this")
+    parser.add_argument("--max-lost", type=int, help="exit 1 if more events than this get no reply")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    configure_logging(log_dir=args.log_dir, level=getattr(logging, args.log_level.upper()))
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    failures = []
+    if args.max_p99_ms is not None and result["latency_ms"]["p99"] > args.max_p99_ms:
+        failures.append(f"p99 {result['latency_ms']['p99']}ms > {args.max_p99_ms}ms")
+    if args.max_rss_growth_mb is not None and result["rss_mb"]["growth"] > args.max_rss_growth_mb:
+        failures.append(f"RSS growth {result['rss_mb']['growth']}MB > {args.max_rss_growth_mb}MB")
+    if args.max_lost is not None and result["lost"] > args.max_lost:
+        failures.append(f"{result['lost']} events got no reply")
+    if failures:
+        raise SystemExit("; ".join(failures))
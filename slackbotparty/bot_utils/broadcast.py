@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+
+class BroadcastResult():
+    """Delivery results of a broadcast, keyed by (bot name, channel)."""
+
+    def __init__(self, results: dict, elapsed: float):
+        self.results = results
+        self.elapsed = elapsed
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def ok(self):
+        return all(result.ok for result in self.results.values())
+
+    @property
+    def failed(self) -> dict:
+        return {target: result for target, result in self.results.items() if not result.ok}
+
+    def __repr__(self):
+        return f"<BroadcastResult {len(self) - len(self.failed)}/{len(self)} delivered in {self.elapsed:.2f}s>"
+
+
+async def broadcast(bots, message, channels=None) -> BroadcastResult:
+    """Post `message` as each bot to each of `channels` (default: the bot's default channel), all at once.
+
+    `message` is a string or a function of the bot, for per-bot variants.
+    All posts are submitted concurrently, so with a spool they share one
+    journal commit, and none is awaited until all are queued: the whole
+    broadcast takes about one round-trip. Each bot's sender still applies
+    its rate limits and per-channel ordering, and `send_workers` caps how
+    many channels one bot posts to at a time.
+    """
+    start = time.perf_counter()
+    targets, submits = [], []
+    for bot in bots:
+        text = message(bot) if callable(message) else message
+        for channel in channels or [bot.default_channel]:
+            targets.append((bot.name, channel))
+            submits.append(bot.send_message(channel, text))
+    futures = await asyncio.gather(*submits)
+    delivered = await asyncio.gather(*futures)
+    return BroadcastResult(dict(zip(targets, delivered)), time.perf_counter() - start)
@@ -0,0 +1,50 @@
+import re
+
+
+class CommandMatch():
+    def __init__(self, name: str, args: str):
+        self.name = name
+        self.args = args
+
+    def __repr__(self):
+        return f"<CommandMatch {self.name} {self.args!r}>"
+
+
+class CommandRouter():
+    """Matches a message against every registered command in one regex pass.
+
+    Commands are a mapping of command name to keywords. A keyword must open
+    the message (after any leading @mentions) and end on a word boundary, so
+    "@bot reset" and "reset please" route to `reset` while "threshold reset"
+    does not. Spaces in a keyword match any run of whitespace; keywords
+    starting with "re:" are used as regular expressions as-is.
+    """
+
+    def __init__(self, commands: dict):
+        self.commands = {name: list(keywords) for name, keywords in commands.items() if keywords}
+        self._groups = {}
+        alternatives = []
+        for i, (name, keywords) in enumerate(self.commands.items()):
+            group = f"c{i}"
+            self._groups[group] = name
+            patterns = [self._pattern(k) for k in sorted(keywords, key=len, reverse=True)]
+            alternatives.append(f"(?P<{group}>{'|'.join(patterns)})")
+        if alternatives:
+            self._regex = re.compile(r'^\s*(?:<@[^>]+>[\s,:]*)*(?:' + '|'.join(alternatives) + r')(?!\w)',
+                                     re.IGNORECASE)
+        else:
+            self._regex = None
+
+    @staticmethod
+    def _pattern(keyword: str) -> str:
+        if keyword.startswith("re:"):
+            return f"(?:{keyword[3:]})"
+        return r'\s+'.join(re.escape(word) for word in keyword.split())
+
+    def route(self, text: str):
+        if self._regex is None or not text:
+            return None
+        match = self._regex.match(text)
+        if match is None:
+            return None
+        return CommandMatch(self._groups[match.lastgroup], text[match.end():].strip())
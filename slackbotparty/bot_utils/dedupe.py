@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+
+
+class TTLSet():
+    """Set of recently seen keys; each key is forgotten `ttl` seconds after insertion.
+
+    Keys are kept in insertion order, so expired keys are always at the front
+    and eviction is amortised O(1). `max_size` caps memory if traffic outruns
+    the TTL.
+    """
+
+    def __init__(self, ttl: float = 600, max_size: int = 100_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._expiry = OrderedDict()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def _evict(self, now: float):
+        while self._expiry:
+            key, expires = next(iter(self._expiry.items()))
+            if expires > now and len(self._expiry) <= self.max_size:
+                break
+            del self._expiry[key]
+
+    def __contains__(self, key):
+        expires = self._expiry.get(key)
+        return expires is not None and expires > time.monotonic()
+
+    def add(self, key) -> bool:
+        """Record `key`; returns False if it was already present."""
+        now = time.monotonic()
+        self._evict(now)
+        expires = self._expiry.get(key)
+        if expires is not None and expires > now:
+            return False
+        self._expiry[key] = now + self.ttl
+        self._expiry.move_to_end(key)
+        return True
+
+
+def event_keys(body: dict) -> list:
+    """Keys identifying one logical event.
+
+    `event_id` catches Slack redelivering the same envelope; `client_msg_id`
+    and channel+ts identify the same message arriving through a different app.
+    The event type is part of the message keys so that the `message` and
+    `app_mention` events for one message are not collapsed into one.
+    """
+    event = body.get("event") or {}
+    kind = event.get("type")
+    keys = []
+    if body.get("event_id"):
+        keys.append(("event_id", body["event_id"]))
+    if event.get("client_msg_id"):
+        keys.append(("msg", kind, event["client_msg_id"]))
+    if event.get("channel") and event.get("ts"):
+        keys.append(("ts", kind, event["channel"], event["ts"]))
+    return keys
+
+
+class EventDeduper():
+    """Drops events that have already been dispatched.
+
+    Each bot has its own deduper by default; bots can also share one, which
+    bounds memory for the whole process. Keys are scoped by `scope` (the
+    bot's name), so a bot that ignores an event can't stop another bot
+    from answering it.
+    """
+
+    def __init__(self, ttl: float = 600, max_size: int = 100_000):
+        self.seen = TTLSet(ttl, max_size)
+        self.stats = {"unique": 0, "duplicates": 0}
+
+    def first_time(self, body: dict, scope: str = None) -> bool:
+        keys = [(scope, *key) for key in event_keys(body)]
+        if not keys:
+            return True
+        if any(k in self.seen for k in keys):
+            self.stats["duplicates"] += 1
+            return False
+        for k in keys:
+            self.seen.add(k)
+        self.stats["unique"] += 1
+        return True
+
+
+_shared = None
+
+
+def shared_deduper() -> EventDeduper:
+    """Process-wide deduper for bots with "dedupe_shared": true; each bot still dedupes only its own events."""
+    global _shared
+    if _shared is None:
+        _shared = EventDeduper()
+    return _shared
@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from bot_utils.log import get_bot_logger
+
+
+def frame_name(frame) -> str:
+    return f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})"
+
+
+def collapse(frame) -> str:
+    """A stack as one flamegraph "folded" line, outermost frame first."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def is_idle(frame) -> bool:
+    # the loop is waiting in the selector for I/O or its next timer
+    return frame.f_code.co_name in ("select", "poll") and frame.f_code.co_filename.endswith("selectors.py")
+
+
+class LoopDiagnostics():
+    """Watches an event loop from a background thread for stalls and hot paths.
+
+    The loop bumps a heartbeat every `heartbeat` seconds. A sampler thread
+    grabs the loop thread's stack every `sample_interval` seconds: samples
+    where the loop is busy feed a profile, and samples taken while the
+    heartbeat is more than `threshold` seconds late are counted as a
+    stall. Each stall is logged with where it was spent, and every
+    `profile_interval` seconds the profile and stall stacks are written to
+    `log_dir` as collapsed stacks (flamegraph.pl / speedscope input).
+
+    asyncio's debug-mode slow-callback warnings are switched on too, with
+    the same threshold.
+    """
+
+    def __init__(self, loop, threshold: float = 0.25, sample_interval: float = 0.01, heartbeat: float = 0.05,
+                 profile_interval: float = 60, log_dir: str = "logs", logger=None):
+        self.loop = loop
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.heartbeat = heartbeat
+        self.profile_interval = profile_interval
+        self.log_dir = log_dir
+        self.logger = logger or get_bot_logger("diagnostics")
+        self.profile = Counter()
+        self.stalls = Counter()
+        self.stats = {"samples": 0, "busy": 0, "stalls": 0, "stalled_seconds": 0.0}
+        self._last_beat = time.monotonic()
+        self._loop_thread = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        if not self._stop.is_set():
+            self.loop.call_later(self.heartbeat, self._beat)
+
+    def start(self):
+        """Call from the loop's thread, before or while it runs."""
+        self._loop_thread = threading.get_ident()
+        self.loop.set_debug(True)
+        self.loop.slow_callback_duration = self.threshold
+        # debug mode's slow callback warnings go to the "asyncio" logger
+        get_bot_logger("asyncio").setLevel("WARNING")
+        self.loop.call_soon(self._beat)
+        self._thread = threading.Thread(target=self._run, name="loop-diagnostics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write_profiles()
+
+    def _run(self):
+        stall_started = None
+        stall_stacks = Counter()
+        next_write = time.monotonic() + self.profile_interval
+        while not self._stop.wait(self.sample_interval):
+            now = time.monotonic()
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self.stats["samples"] += 1
+            stalled = now - self._last_beat > self.heartbeat + self.threshold
+            if not is_idle(frame):
+                stack = collapse(frame)
+                self.stats["busy"] += 1
+                self.profile[stack] += 1
+                if stalled:
+                    stall_stacks[stack] += 1
+                    if stall_started is None:
+                        stall_started = self._last_beat
+            del frame
+            if stall_started is not None and not stalled:
+                self._report_stall(now - stall_started, stall_stacks)
+                stall_started = None
+                stall_stacks = Counter()
+            if now >= next_write:
+                self.write_profiles()
+                next_write = now + self.profile_interval
+
+    def _report_stall(self, duration: float, stacks: Counter):
+        self.stats["stalls"] += 1
+        self.stats["stalled_seconds"] += duration
+        self.stalls.update(stacks)
+        stack, count = stacks.most_common(1)[0]
+        where = " <- ".join(reversed(stack.split(";")[-4:]))
+        self.logger.warning(f"Event loop stalled for {duration:.2f}s, {count}/{sum(stacks.values())} samples in {where}")
+
+    def write_profiles(self):
+        """Write and reset the collected stacks; only called from the sampler thread or after it stops."""
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        for kind in ("profile", "stalls"):
+            counts = getattr(self, kind)
+            if not counts:
+                continue
+            setattr(self, kind, Counter())
+            path = os.path.join(self.log_dir, f"{kind}-{os.getpid()}-{stamp}.folded")
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(path, "w") as f:
+                for stack, count in counts.items():
+                    f.write(f"{stack} {count}\n")
+            self.logger.info(f"Wrote {sum(counts.values())} samples to {path}")
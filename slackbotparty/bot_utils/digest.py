@@ -0,0 +1,102 @@
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+
+_VARIABLE = re.compile(r'0x[0-9a-f]+|[0-9a-f]{8,}|\d+')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(text: str) -> str:
+    """Collapse the parts of an alert that vary between repeats (numbers, ids, spacing)."""
+    return _SPACE.sub(' ', _VARIABLE.sub('#', text.lower())).strip()
+
+
+class AlertGroup():
+    def __init__(self, text: str):
+        self.text = text
+        self.count = 0
+        self.first_seen = time.time()
+        self.last_seen = self.first_seen
+
+
+class AlertAggregator():
+    """Collapses bursts of similar alerts into one digest per channel per window.
+
+    The first alert in a channel opens a window and, with `leading_edge`, is
+    posted straight away. Alerts that arrive while the window is open are
+    grouped by fingerprint and posted as a single digest when it closes.
+    """
+
+    def __init__(self, emit, window: float = 30, fields=("message",), max_lines: int = 10,
+                 leading_edge: bool = True):
+        self.emit = emit
+        self.window = window
+        self.fields = tuple(fields)
+        self.max_lines = max_lines
+        self.leading_edge = leading_edge
+        self.stats = {"received": 0, "posted": 0, "digests": 0, "collapsed": 0}
+        self._windows = {}
+        self._timers = {}
+
+    def fingerprint(self, payload) -> str:
+        if isinstance(payload, dict):
+            values = [payload.get(f) for f in self.fields]
+            if any(v is not None for v in values):
+                return normalize(json.dumps(values, sort_keys=True, default=str))
+        return normalize(json.dumps(payload, sort_keys=True, default=str))
+
+    async def add(self, channel: str, text: str, payload):
+        self.stats["received"] += 1
+        groups = self._windows.get(channel)
+        if groups is None:
+            self._windows[channel] = OrderedDict()
+            self._timers[channel] = asyncio.create_task(self._close_after(channel))
+            if self.leading_edge:
+                self.stats["posted"] += 1
+                await self.emit(channel, text)
+                return
+            groups = self._windows[channel]
+        key = self.fingerprint(payload)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = AlertGroup(text)
+        else:
+            self.stats["collapsed"] += 1
+        group.count += 1
+        group.last_seen = time.time()
+
+    async def _close_after(self, channel: str):
+        await asyncio.sleep(self.window)
+        self._timers.pop(channel, None)
+        await self.flush(channel)
+
+    async def flush(self, channel: str):
+        groups = self._windows.pop(channel, None)
+        if not groups:
+            return
+        self.stats["digests"] += 1
+        self.stats["posted"] += 1
+        await self.emit(channel, self.render(groups))
+
+    def render(self, groups) -> str:
+        total = sum(g.count for g in groups.values())
+        ranked = sorted(groups.values(), key=lambda g: g.count, reverse=True)
+        lines = [f":rotating_light: {total} alert{'s' if total != 1 else ''} in the last "
+                 f"{self.window:g}s ({len(groups)} distinct):"]
+        for group in ranked[:self.max_lines]:
+            summary = " ".join(group.text.split())[:200]
+            lines.append(f"• {group.count}× {summary}")
+        if len(ranked) > self.max_lines:
+            rest = sum(g.count for g in ranked[self.max_lines:])
+            lines.append(f"…and {rest} more across {len(ranked) - self.max_lines} other alerts")
+        return "\n".join(lines)
+
+    async def close(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        await asyncio.gather(*self._timers.values(), return_exceptions=True)
+        self._timers = {}
+        for channel in list(self._windows):
+            await self.flush(channel)
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot_utils.ratelimit import RateLimiter
+
+MENTION = re.compile(r"<@([UW][A-Z0-9]+)(?:\|[^>]*)?>")
+
+
+def channel_record(channel: dict) -> dict:
+    return {
+        "id": channel["id"],
+        "name": channel.get("name", ""),
+        "is_private": channel.get("is_private", False),
+        "is_archived": channel.get("is_archived", False),
+        "is_member": channel.get("is_member", False),
+    }
+
+
+def user_record(user: dict) -> dict:
+    profile = user.get("profile", {})
+    return {
+        "id": user["id"],
+        "name": user.get("name", ""),
+        "real_name": profile.get("real_name") or user.get("real_name", ""),
+        "display_name": profile.get("display_name") or profile.get("real_name") or user.get("name", ""),
+        "is_bot": user.get("is_bot", False),
+        "deleted": user.get("deleted", False),
+    }
+
+
+class Directory():
+    """Cached channels and users of the bot's workspace.
+
+    `start` loads everything in the background with paginated
+    conversations.list / users.list calls (paced by `limiter`), or from a
+    snapshot younger than `max_age` if there is one. Afterwards
+    `handle_event` keeps it current from channel_*, member_joined_channel,
+    user_change and team_join events, and `close` writes a new snapshot.
+    Lookups are dict reads and return None for anything not (yet) known.
+    """
+
+    EVENTS = ("channel_created", "channel_rename", "channel_archive", "channel_unarchive", "channel_deleted",
+              "member_joined_channel", "member_left_channel", "user_change", "team_join")
+
+    def __init__(self, client: AsyncWebClient, snapshot_path: str = None, max_age: float = 24 * 3600,
+                 page_size: int = 200, channel_types: str = "public_channel", limiter: RateLimiter = None,
+                 logger=None):
+        self.client = client
+        self.snapshot_path = snapshot_path
+        self.max_age = max_age
+        self.page_size = page_size
+        self.channel_types = channel_types
+        self.limiter = limiter or RateLimiter()
+        self.logger = logger or logging.getLogger(__name__)
+        self.self_id = None
+        self.channels = {}
+        self.users = {}
+        self.loaded = asyncio.Event()
+        self.stats = {"api_calls": 0, "hits": 0, "misses": 0, "events": 0}
+        self._channel_ids = {}
+        self._task = None
+
+    def __len__(self):
+        return len(self.channels) + len(self.users)
+
+    # lookups
+
+    def channel(self, channel: str) -> dict:
+        """A channel by ID, name or #name."""
+        return self.channels.get(self.channel_id(channel) or channel)
+
+    def channel_id(self, channel: str) -> str:
+        if channel in self.channels:
+            self.stats["hits"] += 1
+            return channel
+        channel_id = self._channel_ids.get(channel.lstrip("#"))
+        self.stats["hits" if channel_id else "misses"] += 1
+        return channel_id
+
+    def resolve_channel(self, channel: str) -> str:
+        """The ID for a channel name, or `channel` as given if it isn't known."""
+        return self.channel_id(channel) or channel
+
+    def user(self, user_id: str) -> dict:
+        user = self.users.get(user_id)
+        self.stats["hits" if user else "misses"] += 1
+        return user
+
+    def display_name(self, user_id: str) -> str:
+        user = self.user(user_id)
+        return user["display_name"] if user else None
+
+    def expand_mentions(self, text: str) -> str:
+        """Replace <@U…> mentions of known users with @display name, dropping the bot's own."""
+        def name(match):
+            if match.group(1) == self.self_id:
+                return ""
+            display = self.display_name(match.group(1))
+            return f"@{display}" if display else match.group(0)
+        return MENTION.sub(name, text).strip()
+
+    # updates
+
+    def _put_channel(self, channel: dict):
+        old = self.channels.get(channel["id"])
+        if old is not None and self._channel_ids.get(old["name"]) == old["id"]:
+            del self._channel_ids[old["name"]]
+        self.channels[channel["id"]] = channel
+        if channel["name"]:
+            self._channel_ids[channel["name"]] = channel["id"]
+
+    def _drop_channel(self, channel_id: str):
+        channel = self.channels.pop(channel_id, None)
+        if channel is not None and self._channel_ids.get(channel["name"]) == channel_id:
+            del self._channel_ids[channel["name"]]
+
+    def handle_event(self, event: dict):
+        kind = event.get("type")
+        self.stats["events"] += 1
+        if kind in ("channel_created", "channel_rename"):
+            known = self.channels.get(event["channel"]["id"], {})
+            self._put_channel(channel_record({**known, **event["channel"]}))
+        elif kind in ("channel_archive", "channel_unarchive"):
+            channel = self.channels.get(event["channel"])
+            if channel is not None:
+                channel["is_archived"] = kind == "channel_archive"
+        elif kind == "channel_deleted":
+            self._drop_channel(event["channel"])
+        elif kind in ("member_joined_channel", "member_left_channel"):
+            channel = self.channels.get(event["channel"])
+            if channel is not None and event.get("user") == self.self_id:
+                channel["is_member"] = kind == "member_joined_channel"
+        elif kind in ("user_change", "team_join"):
+            self.users[event["user"]["id"]] = user_record(event["user"])
+
+    # loading
+
+    async def _pages(self, method: str, key: str, **params):
+        cursor = None
+        while True:
+            await self.limiter.acquire(method)
+            try:
+                response = await self.client.api_call(method, params={**params, "limit": self.page_size,
+                                                                      **({"cursor": cursor} if cursor else {})})
+            except SlackApiError as e:
+                if e.response.status_code != 429:
+                    raise
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                self.limiter.throttle(method, None, retry_after)
+                continue
+            self.stats["api_calls"] += 1
+            for item in response.get(key, []):
+                yield item
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                return
+
+    async def refresh(self):
+        """Bulk-load every channel and user from the API."""
+        start = time.perf_counter()
+        channels = [channel_record(c) async for c in self._pages("conversations.list", "channels",
+                                                                  types=self.channel_types)]
+        users = [user_record(u) async for u in self._pages("users.list", "members")]
+        self._replace(channels, users)
+        self.logger.info(f"Loaded {len(channels)} channels and {len(users)} users "
+                         f"in {time.perf_counter() - start:.1f}s")
+
+    def _replace(self, channels: list, users: list):
+        self.channels = {}
+        self._channel_ids = {}
+        for channel in channels:
+            self._put_channel(channel)
+        self.users = {user["id"]: user for user in users}
+
+    def _read_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if time.time() - snapshot.get("saved", 0) > self.max_age:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, snapshot: dict):
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.snapshot_path)
+
+    async def save(self):
+        if not self.snapshot_path or not self.loaded.is_set():
+            return
+        snapshot = {"saved": time.time(), "channels": list(self.channels.values()), "users": list(self.users.values())}
+        try:
+            await asyncio.to_thread(self._write_snapshot, snapshot)
+        except Exception as e:
+            self.logger.warning(f"Failed to save directory snapshot {self.snapshot_path}: {e}")
+
+    async def load(self):
+        try:
+            snapshot = await asyncio.to_thread(self._read_snapshot)
+        except Exception as e:
+            self.logger.warning(f"Ignoring directory snapshot {self.snapshot_path}: {e}")
+            snapshot = None
+        if snapshot is not None:
+            self._replace(snapshot["channels"], snapshot["users"])
+            self.logger.info(f"Loaded {len(self.channels)} channels and {len(self.users)} users from {self.snapshot_path}")
+        else:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.logger.error(f"Failed to load the channel and user directory: {e}")
+                return
+        self.loaded.set()
+        if snapshot is None:
+            await self.save()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.load())
+
+    async def wait_loaded(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for the first load to finish; True if it succeeded."""
+        if self._task is not None:
+            await asyncio.wait([self._task], timeout=timeout)
+        return self.loaded.is_set()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.save()
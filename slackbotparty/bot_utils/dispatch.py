@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+
+# lower runs first
+PRIORITY_COMMAND = 0
+PRIORITY_MESSAGE = 1
+PRIORITY_LLM = 2
+
+SHED_BUSY = "busy"
+SHED_DROP_OLDEST = "drop_oldest"
+SHED_DROP_NEWEST = "drop_newest"
+SHED_POLICIES = (SHED_BUSY, SHED_DROP_OLDEST, SHED_DROP_NEWEST)
+
+
+class Job():
+    def __init__(self, priority: int, seq: int, fn, args, on_shed=None):
+        self.priority = priority
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.on_shed = on_shed
+        # the submitter's context (log context, current span); the job runs in
+        # it rather than in the long-lived worker task's
+        self.context = contextvars.copy_context()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class EventDispatcher():
+    """Bounded priority queue of event handler jobs, drained by a pool of workers.
+
+    Bolt listeners submit work and return at once. When the queue is full a
+    queued job of lower priority is evicted in favour of the new one;
+    otherwise the shed policy decides:
+
+    - "busy": reject the new job and call its on_shed callback (e.g. reply "busy")
+    - "drop_oldest": evict the oldest queued job of the same priority
+    - "drop_newest": reject the new job
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100, policy: str = SHED_BUSY, logger=None):
+        if policy not in SHED_POLICIES:
+            raise ValueError(f"unknown shed policy {policy!r}, expected one of {SHED_POLICIES}")
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.policy = policy
+        self.logger = logger or logging.getLogger(__name__)
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "shed": 0}
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._shed_tasks = set()
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def running(self):
+        return any(not t.done() for t in self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    def submit(self, priority: int, fn, *args, on_shed=None) -> bool:
+        """Queue `await fn(*args)`; returns False if the job was shed."""
+        self.start()
+        job = Job(priority, next(self._seq), fn, args, on_shed)
+        self.stats["submitted"] += 1
+        if len(self._heap) >= self.max_queue:
+            victim = self._victim_for(job)
+            if victim is None:
+                self._shed(job)
+                return False
+            self._heap.remove(victim)
+            heapq.heapify(self._heap)
+            self._shed(victim)
+        heapq.heappush(self._heap, job)
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    def _victim_for(self, job: Job):
+        lowest = max(j.priority for j in self._heap)
+        candidates = [j for j in self._heap if j.priority == lowest]
+        if lowest > job.priority:
+            return max(candidates, key=lambda j: j.seq)
+        if lowest == job.priority and self.policy == SHED_DROP_OLDEST:
+            return min(candidates, key=lambda j: j.seq)
+        return None
+
+    def _shed(self, job: Job):
+        self.stats["shed"] += 1
+        self.logger.warning(f"Event queue full ({self.max_queue}), shedding {getattr(job.fn, '__name__', job.fn)}")
+        if self.policy == SHED_BUSY and job.on_shed is not None:
+            task = asyncio.create_task(self._run(job.on_shed, ()), context=job.context)
+            self._shed_tasks.add(task)
+            task.add_done_callback(self._shed_tasks.discard)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            job = heapq.heappop(self._heap)
+            self._active += 1
+            try:
+                if await asyncio.create_task(self._run(job.fn, job.args), context=job.context):
+                    self.stats["completed"] += 1
+                else:
+                    self.stats["failed"] += 1
+            finally:
+                self._active -= 1
+                if not self._active and not self._heap:
+                    self._idle.set()
+
+    async def _run(self, fn, args) -> bool:
+        try:
+            await fn(*args)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.exception(f"Error in {getattr(fn, '__name__', fn)}: {e}")
+            return False
+
+    async def close(self, timeout: float = 0):
+        """Stop the workers, first letting them finish queued jobs for up to `timeout` seconds."""
+        if timeout and self.running:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Dropping {len(self._heap)} queued and {self._active} running jobs "
+                                    f"after {timeout}s")
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._heap = []
+        self._active = 0
+        self._idle.set()
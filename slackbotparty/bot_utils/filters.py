@@ -0,0 +1,65 @@
+# message subtypes that are edits, deletions, joins, topic changes... rather
+# than something a person said
+ALLOWED_SUBTYPES = {None, "thread_broadcast", "file_share"}
+
+
+class EventFilter():
+    """Cheap checks that run on raw `message` events before anything else.
+
+    The list of checks is built once from the bot's options, so bots that
+    don't watch all messages drop them with a single test.
+    """
+
+    def __init__(self, watch_all_messages: bool = False, channels=None, reply_to_bots: bool = False):
+        self.watch_all_messages = watch_all_messages
+        self.channels = set(channels) if channels else None
+        self.reply_to_bots = reply_to_bots
+        self.bot_user_id = None
+        self.bot_id = None
+        self.stats = {}
+        self._checks = self._compile()
+
+    @classmethod
+    def from_options(cls, options: dict):
+        return cls(
+            watch_all_messages=options.get("watch_all_messages", False),
+            channels=options.get("watch_channels"),
+            reply_to_bots=options.get("reply_to_bots", False),
+        )
+
+    def set_identity(self, user_id: str, bot_id: str):
+        self.bot_user_id = user_id
+        self.bot_id = bot_id
+
+    def _compile(self):
+        if not self.watch_all_messages:
+            return [("not_watching", lambda event: True)]
+        checks = [
+            ("subtype", lambda event: event.get("subtype") not in ALLOWED_SUBTYPES),
+            ("own_message", self._is_own),
+        ]
+        if not self.reply_to_bots:
+            checks.append(("bot_message", lambda event: "bot_id" in event))
+        if self.channels is not None:
+            checks.append(("channel", lambda event: event.get("channel") not in self.channels))
+        checks.append(("mention", self._is_mention))
+        return checks
+
+    def _is_own(self, event: dict) -> bool:
+        return ((self.bot_user_id is not None and event.get("user") == self.bot_user_id)
+                or (self.bot_id is not None and event.get("bot_id") == self.bot_id))
+
+    def _is_mention(self, event: dict) -> bool:
+        # messages that @mention us arrive again as app_mention, which handles them
+        text = event.get("text") or ""
+        if self.bot_user_id is None:
+            # can't tell whose mention it is; a missed message beats a double reply
+            return "<@" in text
+        return f"<@{self.bot_user_id}>" in text or f"<@{self.bot_user_id}|" in text
+
+    def accept_message(self, event: dict) -> bool:
+        for reason, rejects in self._checks:
+            if rejects(event):
+                self.stats[reason] = self.stats.get(reason, 0) + 1
+                return False
+        return True
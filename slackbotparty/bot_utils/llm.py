@@ -0,0 +1,196 @@
+import asyncio
+import codecs
+import json
+import time
+import aiohttp
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker():
+    """Fails fast after repeated backend failures.
+
+    closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one trial call is let through (half-open), which
+    either closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open":
+            # let one trial call through and re-arm the timer for the next one
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LLMClient():
+    """Long-lived client for the chat API.
+
+    One keep-alive connection pool is shared by every request, at most
+    `max_in_flight` requests run at once, and a circuit breaker rejects calls
+    while the backend is failing. `timeout` bounds a whole `chat` call; for
+    `stream_chat` it bounds the silence between chunks instead, so a long
+    reply isn't cut off while it is still arriving.
+    """
+
+    def __init__(self, base_url: str, max_in_flight: int = 8, timeout: float = 60, connect_timeout: float = 5,
+                 pool_size: int = 10, breaker: CircuitBreaker = None, connector: aiohttp.BaseConnector = None):
+        self.base_url = base_url.rstrip('/')
+        self.max_in_flight = max_in_flight
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=timeout)
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.connector = connector
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            if self.connector is not None:
+                # shared pool: closing this session leaves it open for the other bots
+                self._session = aiohttp.ClientSession(connector=self.connector, connector_owner=False,
+                                                      timeout=self.timeout)
+            else:
+                connector = aiohttp.TCPConnector(ssl=False, limit=self.pool_size, keepalive_timeout=60)
+                self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def chat(self, message: str, session_id: str):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"LLM backend unavailable, retrying after {self.breaker.reset_timeout}s")
+        req_body = {
+            "message": message,
+            "session_id": session_id,
+        }
+        async with self._semaphore:
+            try:
+                async with self.session.post(self.base_url + '/chat', json=req_body, ssl=False) as response:
+                    response.raise_for_status()
+                    if response.content_type == 'application/json':
+                        result = await response.json()
+                    else:
+                        result = await response.text()
+            except aiohttp.ClientResponseError as e:
+                if e.status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+        self.breaker.record_success()
+        return result
+
+    async def stream_chat(self, message: str, session_id: str):
+        """Yield the reply text in chunks as the chat API produces them.
+
+        Understands server-sent events (`data: {...}` lines, ending with
+        `data: [DONE]`), newline-delimited JSON and plain chunked text. A
+        server that answers with a single JSON body yields it as one chunk.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"LLM backend unavailable, retrying after {self.breaker.reset_timeout}s")
+        req_body = {
+            "message": message,
+            "session_id": session_id,
+            "stream": True,
+        }
+        headers = {"Accept": "text/event-stream, application/x-ndjson, text/plain"}
+        async with self._semaphore:
+            try:
+                async with self.session.post(self.base_url + '/chat', json=req_body, headers=headers, ssl=False,
+                                             timeout=self.stream_timeout) as response:
+                    response.raise_for_status()
+                    if response.content_type == 'text/event-stream':
+                        async for line in response.content:
+                            line = line.decode().strip()
+                            if not line.startswith('data:'):
+                                continue
+                            data = line[5:].strip()
+                            if data == '[DONE]':
+                                break
+                            chunk = chunk_text(data)
+                            if chunk:
+                                yield chunk
+                    elif response.content_type == 'application/x-ndjson':
+                        async for line in response.content:
+                            chunk = chunk_text(line.decode().strip())
+                            if chunk:
+                                yield chunk
+                    elif response.content_type == 'application/json':
+                        yield chunk_text(await response.text())
+                    else:
+                        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                        async for data in response.content.iter_any():
+                            chunk = decoder.decode(data)
+                            if chunk:
+                                yield chunk
+            except aiohttp.ClientResponseError as e:
+                if e.status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            except GeneratorExit:
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+        self.breaker.record_success()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def chunk_text(data: str) -> str:
+    """Pull the text out of one streamed chunk (JSON or raw text)."""
+    if not data:
+        return ""
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return data
+    if isinstance(payload, str):
+        return payload
+    if not isinstance(payload, dict):
+        return ""
+    for key in ("content", "delta", "text"):
+        if isinstance(payload.get(key), str):
+            return payload[key]
+    response = payload.get("response")
+    if isinstance(response, dict):
+        return response.get("content", "")
+    return ""
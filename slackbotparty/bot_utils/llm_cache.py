@@ -0,0 +1,124 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+
+_MENTION = re.compile(r'<@[^>]+>')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_prompt(text: str) -> str:
+    """Fold away differences that don't change the question: mentions, case, spacing, trailing punctuation."""
+    text = _MENTION.sub(' ', text).lower()
+    return _SPACE.sub(' ', text).strip().rstrip('?!. ')
+
+
+class SingleFlight():
+    """Runs at most one call per key; concurrent callers with the same key share its result."""
+
+    def __init__(self):
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def in_flight(self, key) -> bool:
+        return key in self._calls
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield so one caller giving up doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+
+class ResponseCache():
+    """Size-bounded LRU of responses that expire `ttl` seconds after they were stored."""
+
+    def __init__(self, ttl: float = 30, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value) -> int:
+        """Store a value; returns how many entries were evicted to make room."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+
+class CachedLLMClient():
+    """Wraps an LLMClient so identical prompts share one backend call.
+
+    Identical prompts in the same session that are in flight together are
+    coalesced into one request. With `ttl` > 0, responses are also cached
+    for that many seconds. With scope="global" the session is left out of
+    the key, so the same question is shared across channels. `rewrite`, if
+    given, is applied to a prompt only after its key is taken, so it can
+    change what the backend sees without changing what counts as a hit.
+    """
+
+    def __init__(self, client, ttl: float = 0, max_entries: int = 256, scope: str = "session", rewrite=None):
+        self.client = client
+        self.scope = scope
+        self.rewrite = rewrite
+        self.flights = SingleFlight()
+        self.cache = ResponseCache(ttl, max_entries) if ttl > 0 else None
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    @property
+    def breaker(self):
+        return self.client.breaker
+
+    def key(self, message: str, session_id: str):
+        prompt = normalize_prompt(message)
+        return prompt if self.scope == "global" else (session_id, prompt)
+
+    async def chat(self, message: str, session_id: str):
+        key = self.key(message, session_id)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                return cached
+        if self.flights.in_flight(key):
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+        return await self.flights.do(key, lambda: self._fetch(key, message, session_id))
+
+    async def _fetch(self, key, message: str, session_id: str):
+        if self.rewrite is not None:
+            message = self.rewrite(message)
+        result = await self.client.chat(message, session_id)
+        if self.cache is not None:
+            self.stats["evictions"] += self.cache.put(key, result)
+        return result
+
+    def stream_chat(self, message: str, session_id: str):
+        if self.rewrite is not None:
+            message = self.rewrite(message)
+        return self.client.stream_chat(message, session_id)
+
+    async def close(self):
+        await self.client.close()
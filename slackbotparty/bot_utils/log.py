@@ -0,0 +1,137 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# team/channel/user of the event being handled by the current task
+log_context = contextvars.ContextVar("log_context", default={})
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(team)s - %(channel)s - %(user)s - %(levelname)s - %(message)s'
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        context = log_context.get()
+        record.team = getattr(record, 'team', context.get('team', 'unknown_team'))
+        record.channel = getattr(record, 'channel', context.get('channel', 'unknown_channel'))
+        record.user = getattr(record, 'user', context.get('user', 'unknown_user'))
+        return True
+
+
+def bind_log_context(**fields):
+    """Attach fields to every log record emitted from the current task."""
+    return log_context.set({**log_context.get(), **fields})
+
+
+def reset_log_context(token):
+    log_context.reset(token)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "team": getattr(record, "team", None),
+            "channel": getattr(record, "channel", None),
+            "user": getattr(record, "user", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class PerLoggerFileHandler(logging.Handler):
+    """Routes records to logs/{logger name}.log, one rotating file per bot."""
+
+    def __init__(self, log_dir: str, formatter: logging.Formatter, suffix: str = "log"):
+        super().__init__()
+        self.log_dir = log_dir
+        self.suffix = suffix
+        self.setFormatter(formatter)
+        self._handlers = {}
+
+    def _handler_for(self, name: str) -> logging.Handler:
+        handler = self._handlers.get(name)
+        if handler is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            # rotate every 10mb
+            handler = RotatingFileHandler(os.path.join(self.log_dir, f'{name}.{self.suffix}'),
+                                          maxBytes=10*1024*1024, backupCount=5)
+            handler.setFormatter(self.formatter)
+            self._handlers[name] = handler
+        return handler
+
+    def emit(self, record):
+        self._handler_for(record.name).handle(record)
+
+    def close(self):
+        for handler in self._handlers.values():
+            handler.close()
+        super().close()
+
+
+class LoggingPipeline():
+    """Process-wide logging: loggers only enqueue, one listener thread does the I/O."""
+
+    def __init__(self, log_dir: str = "logs", json_lines: bool = False, level=logging.INFO):
+        formatter = JsonLinesFormatter() if json_lines else logging.Formatter(TEXT_FORMAT)
+        console = logging.StreamHandler()
+        console.setFormatter(formatter)
+        files = PerLoggerFileHandler(log_dir, formatter, suffix="jsonl" if json_lines else "log")
+
+        self.level = level
+        self.queue = queue.SimpleQueue()
+        self.handler = QueueHandler(self.queue)
+        self.handler.addFilter(ContextFilter())
+        self.listener = QueueListener(self.queue, console, files)
+        self.listener.start()
+
+    def get_logger(self, name: str) -> logging.Logger:
+        logger = logging.getLogger(name)
+        logger.setLevel(self.level)
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler) and handler is not self.handler:
+                logger.removeHandler(handler)
+        if self.handler not in logger.handlers:
+            logger.addHandler(self.handler)
+        logger.propagate = False
+        return logger
+
+    def stop(self):
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+
+_pipeline = None
+
+
+def configure_logging(log_dir: str = "logs", json_lines: bool = None, level=logging.INFO) -> LoggingPipeline:
+    """Set up the process logging pipeline. JSON lines output defaults to LOG_FORMAT=json."""
+    global _pipeline
+    if json_lines is None:
+        json_lines = os.environ.get("LOG_FORMAT", "").lower() == "json"
+    if _pipeline is not None:
+        _pipeline.stop()
+    _pipeline = LoggingPipeline(log_dir, json_lines, level)
+    return _pipeline
+
+
+def get_bot_logger(name: str) -> logging.Logger:
+    if _pipeline is None:
+        configure_logging()
+    return _pipeline.get_logger(name)
+
+
+@atexit.register
+def shutdown_logging():
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
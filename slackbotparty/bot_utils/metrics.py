@@ -0,0 +1,335 @@
+import asyncio
+import bisect
+import contextlib
+import functools
+import logging
+import time
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Value():
+    """One labelled series of a counter or gauge; either set directly or read from a function."""
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class HistogramValue():
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (like histogram_quantile, without interpolation)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metric():
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+
+    def _new(self):
+        return Value()
+
+    def labels(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = self._new()
+        return series
+
+    def remove(self, **labels):
+        """Drop every series whose labels include `labels`."""
+        for key in list(self.series):
+            values = dict(zip(self.labelnames, key))
+            if all(values.get(k) == v for k, v in labels.items()):
+                del self.series[key]
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, series in list(self.series.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(series.get())}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new(self):
+        return HistogramValue(self.buckets)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, series in list(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series.sum)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {series.count}"
+
+
+class Registry():
+    """Process-wide set of metrics. Asking for a metric that exists returns it."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _get(self, cls, name: str, help: str, labelnames=(), **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, help, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames=()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_CALLS = REGISTRY.counter("slackbot_handler_calls_total", "Event and command handler invocations",
+                                 ("bot", "handler", "outcome"))
+HANDLER_SECONDS = REGISTRY.histogram("slackbot_handler_seconds", "Event and command handler run time",
+                                     ("bot", "handler"))
+SLACK_API_CALLS = REGISTRY.counter("slackbot_slack_api_calls_total", "Slack Web API calls by result or error code",
+                                   ("bot", "method", "status"))
+SLACK_API_SECONDS = REGISTRY.histogram("slackbot_slack_api_seconds", "Slack Web API call latency",
+                                       ("bot", "method"))
+LLM_SECONDS = REGISTRY.histogram("slackbot_llm_request_seconds", "Chat API request latency",
+                                 ("bot", "mode", "outcome"))
+QUEUE_DEPTH = REGISTRY.gauge("slackbot_queue_depth", "Jobs waiting in a bot's queues", ("bot", "queue"))
+DISPATCH_JOBS = REGISTRY.counter("slackbot_dispatch_jobs_total", "Dispatcher jobs by outcome", ("bot", "state"))
+LOOP_LAG = REGISTRY.gauge("slackbot_event_loop_lag_seconds", "How late the event loop heartbeat last woke up")
+
+
+class BotMetrics():
+    """The metric series for one bot."""
+
+    def __init__(self, bot: str):
+        self.bot = bot
+
+    def timed(self, fn, name: str = None):
+        """Wrap a coroutine function to count its calls and time them."""
+        name = name or fn.__name__
+        seconds = HANDLER_SECONDS.labels(bot=self.bot, handler=name)
+        ok = HANDLER_CALLS.labels(bot=self.bot, handler=name, outcome="ok")
+        error = HANDLER_CALLS.labels(bot=self.bot, handler=name, outcome="error")
+
+        @functools.wraps(fn)
+        async def timed(*args):
+            start = time.perf_counter()
+            try:
+                await fn(*args)
+            except Exception:
+                error.inc()
+                raise
+            else:
+                ok.inc()
+            finally:
+                seconds.observe(time.perf_counter() - start)
+        return timed
+
+    def slack_call(self, method: str, seconds: float, status: str):
+        SLACK_API_SECONDS.labels(bot=self.bot, method=method).observe(seconds)
+        SLACK_API_CALLS.labels(bot=self.bot, method=method, status=status).inc()
+
+    def llm_call(self, mode: str, seconds: float, outcome: str):
+        LLM_SECONDS.labels(bot=self.bot, mode=mode, outcome=outcome).observe(seconds)
+
+    @contextlib.contextmanager
+    def llm_timer(self, mode: str):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.llm_call(mode, time.perf_counter() - start, outcome)
+
+    def watch_queue(self, queue: str, length):
+        QUEUE_DEPTH.labels(bot=self.bot, queue=queue).set_function(length)
+
+    def watch_dispatcher(self, dispatcher):
+        for state in dispatcher.stats:
+            DISPATCH_JOBS.labels(bot=self.bot, state=state).set_function(functools.partial(dispatcher.stats.get, state))
+
+    def llm_summary(self) -> dict:
+        series = [s for key, s in LLM_SECONDS.series.items() if key[0] == self.bot]
+        count = sum(s.count for s in series)
+        ok = [s for key, s in LLM_SECONDS.series.items() if key[0] == self.bot and key[2] == "ok"]
+        worst = max((s.quantile(0.99) for s in ok), default=0.0)
+        return {"count": count, "avg": sum(s.sum for s in series) / count if count else 0.0, "p99": worst}
+
+    def slack_errors(self) -> int:
+        return sum(s.get() for key, s in SLACK_API_CALLS.series.items() if key[0] == self.bot and key[2] != "ok")
+
+    def close(self):
+        for metric in (HANDLER_CALLS, HANDLER_SECONDS, SLACK_API_CALLS, SLACK_API_SECONDS, LLM_SECONDS,
+                       QUEUE_DEPTH, DISPATCH_JOBS):
+            metric.remove(bot=self.bot)
+
+
+def loop_lag():
+    """Last heartbeat lag in seconds, or None if no metrics server is measuring it."""
+    series = LOOP_LAG.series.get(())
+    return series.get() if series is not None else None
+
+
+class LoopLagMonitor():
+    """Heartbeat task: sleeps `interval` and records how late it woke up."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, time.perf_counter() - start - self.interval)
+            LOOP_LAG.labels().set(self.lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class MetricsServer():
+    """Serves REGISTRY in Prometheus text format at http://{host}:{port}/metrics."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100, registry: Registry = REGISTRY, logger=None):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.logger = logger or logging.getLogger(__name__)
+        self.lag = LoopLagMonitor()
+        self.users = 0
+        self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.lag.start()
+        self.logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        await self.lag.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+_servers = {}
+
+
+async def acquire_metrics_server(host: str, port: int, logger=None) -> MetricsServer:
+    """The process's metrics server on host:port, started on first use; bots in one process share it."""
+    server = _servers.get((host, port))
+    if server is None:
+        server = _servers[(host, port)] = MetricsServer(host, port, logger=logger)
+        try:
+            await server.start()
+        except Exception:
+            del _servers[(host, port)]
+            raise
+    server.users += 1
+    return server
+
+
+async def release_metrics_server(server: MetricsServer):
+    server.users -= 1
+    if server.users <= 0:
+        _servers.pop((server.host, server.port), None)
+        await server.close()
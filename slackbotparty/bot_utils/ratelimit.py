@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+# Slack Web API rate limit tiers, in requests per minute.
+# https://api.slack.com/apis/rate-limits
+TIER_LIMITS = {
+    1: 1,
+    2: 20,
+    3: 50,
+    4: 100,
+}
+
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.update": 3,
+    "chat.delete": 3,
+    "conversations.info": 3,
+    "conversations.list": 2,
+    "conversations.members": 4,
+    "users.info": 4,
+    "users.list": 2,
+}
+
+# chat.postMessage is a "special" tier method: roughly one message per second
+# per channel, with short bursts tolerated.
+POST_RATE = 1.0
+POST_BURST = 3
+
+
+class TokenBucket():
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        blocked = max(0.0, self.blocked_until - now)
+        if self.tokens >= 1:
+            return blocked
+        return max(blocked, (1 - self.tokens) / self.rate)
+
+    def consume(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Hold every call for `seconds` (a Retry-After); tokens keep refilling meanwhile."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class RateLimiter():
+    """Token buckets per channel (chat.postMessage) and per method tier."""
+
+    max_channel_buckets = 1000
+
+    def __init__(self, post_rate: float = POST_RATE, post_burst: int = POST_BURST):
+        self.post_rate = post_rate
+        self.post_burst = post_burst
+        self._channels = {}
+        self._tiers = {
+            tier: TokenBucket(per_minute / 60, max(1, per_minute // 10))
+            for tier, per_minute in TIER_LIMITS.items()
+        }
+
+    def _channel_bucket(self, channel: str) -> TokenBucket:
+        bucket = self._channels.get(channel)
+        if bucket is None:
+            if len(self._channels) >= self.max_channel_buckets:
+                self._channels = {c: b for c, b in self._channels.items() if not b.idle}
+            bucket = self._channels[channel] = TokenBucket(self.post_rate, self.post_burst)
+        return bucket
+
+    def buckets_for(self, method: str, channel: str = None):
+        buckets = []
+        tier = METHOD_TIERS.get(method)
+        if tier is not None:
+            buckets.append(self._tiers[tier])
+        if method == "chat.postMessage" and channel:
+            buckets.append(self._channel_bucket(channel))
+        return buckets
+
+    async def acquire(self, method: str, channel: str = None):
+        buckets = self.buckets_for(method, channel)
+        while True:
+            now = time.monotonic()
+            wait = max((b.delay(now) for b in buckets), default=0.0)
+            if wait <= 0:
+                for b in buckets:
+                    b.consume()
+                return
+            await asyncio.sleep(wait)
+
+    def throttle(self, method: str, channel: str, retry_after: float):
+        """Apply a Retry-After from a 429 to every bucket the call went through."""
+        for b in self.buckets_for(method, channel):
+            b.pause(retry_after)
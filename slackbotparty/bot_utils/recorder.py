@@ -0,0 +1,84 @@
+import json
+import os
+import re
+import time
+
+# fields that carry credentials or one-time URLs rather than traffic shape
+SECRET_KEYS = {"token", "response_url", "trigger_id"}
+# free text a user typed
+TEXT_KEYS = {"text", "blocks", "attachments", "previous_message", "message"}
+_MENTION = re.compile(r'(<[@#!][^>]+>)')
+_WORD = re.compile(r'\S')
+
+
+def redact_text(text: str) -> str:
+    """Blank out what a user wrote but keep its length, spacing and mentions."""
+    parts = _MENTION.split(text)
+    return "".join(part if i % 2 else _WORD.sub("x", part) for i, part in enumerate(parts))
+
+
+def redact(value, text: bool = False):
+    """Copy of an envelope with secrets removed and, with `text`, message text blanked out."""
+    if isinstance(value, list):
+        return [redact(item, text) for item in value]
+    if not isinstance(value, dict):
+        return value
+    clean = {}
+    for key, item in value.items():
+        if key in SECRET_KEYS:
+            continue
+        if text and key in TEXT_KEYS:
+            if isinstance(item, str):
+                item = redact_text(item)
+            elif key in ("blocks", "attachments"):
+                continue
+            else:
+                item = redact(item, text)
+        else:
+            item = redact(item, text)
+        clean[key] = item
+    return clean
+
+
+class EventRecorder():
+    """Appends every Socket Mode envelope a bot receives to a JSONL file.
+
+    Each line is {"t": <unix time received>, "envelope": {...}}. Secrets are
+    always stripped; with `redact_text` the text users typed is blanked out
+    too (mentions are kept, so app_mention routing still replays the same).
+    """
+
+    def __init__(self, path: str, redact_text: bool = False):
+        self.path = path
+        self.redact_text = redact_text
+        self.recorded = 0
+        self._file = None
+
+    def listener(self):
+        """A Socket Mode client message listener that records envelopes."""
+        async def record(client, message: dict, raw_message: str):
+            if message.get("envelope_id"):
+                self.record(message)
+        return record
+
+    def record(self, envelope: dict):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        line = {"t": time.time(), "envelope": redact(envelope, self.redact_text)}
+        self._file.write(json.dumps(line) + "\n")
+        self.recorded += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_recording(path: str):
+    """Yield (time, envelope) pairs from a recording, oldest first."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry["t"], entry["envelope"]
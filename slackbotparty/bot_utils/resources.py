@@ -0,0 +1,58 @@
+import aiohttp
+from slack_sdk.web.async_client import AsyncWebClient
+
+
+class ResourceHub():
+    """HTTP resources shared by every bot in a process.
+
+    One aiohttp connector (connection pool, DNS cache, TLS context) backs a
+    single ClientSession that all the bots' Slack Web API clients use; each
+    client still sends its own token per request. LLM clients, webhook
+    pollers and Socket Mode connections get sessions of their own (for
+    their timeouts, or because the SDK closes its session on shutdown) but
+    on the same connector.
+
+    Create one per process, pass it to every bot, and close it after them.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 0, dns_ttl: float = 300,
+                 keepalive_timeout: float = 30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._connector = None
+        self._session = None
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+        return self._connector
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self.client_session()
+        return self._session
+
+    def client_session(self, **kwargs) -> aiohttp.ClientSession:
+        """A new session on the shared connector; closing it leaves the connector open."""
+        return aiohttp.ClientSession(connector=self.connector, connector_owner=False, **kwargs)
+
+    def web_client(self, token: str, base_url: str = AsyncWebClient.BASE_URL, **kwargs) -> AsyncWebClient:
+        return AsyncWebClient(token=token, base_url=base_url, session=self.session, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
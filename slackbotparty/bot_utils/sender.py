@@ -0,0 +1,279 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot_utils.ratelimit import RateLimiter
+from bot_utils.spool import OutboundSpool
+from bot_utils.tracing import current_span, child_span
+
+# Slack errors worth sending again later rather than giving up on
+TRANSIENT_ERRORS = {"internal_error", "fatal_error", "service_unavailable", "request_timeout", "ratelimited"}
+# calls journaled to the spool; replaying a stale chat.update after a restart isn't worth it
+SPOOLED_METHODS = {"chat.postMessage"}
+
+
+class DeliveryResult():
+    def __init__(self, method, channel, response=None, error=None, transient=False):
+        self.method = method
+        self.channel = channel
+        self.response = response
+        self.error = error
+        self.transient = transient
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def ts(self):
+        if self.response is None:
+            return None
+        return self.response.get("ts")
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error}"
+        return f"<DeliveryResult {self.method} {self.channel} {status}>"
+
+
+class OutboundMessage():
+    def __init__(self, method: str, kwargs: dict):
+        self.method = method
+        self.kwargs = kwargs
+        self.channel = kwargs.get("channel")
+        # the caller's span, so delivery is traced under the event that caused it
+        self.span = current_span.get()
+        self.spool_id = None
+        # delivered in the caller's context, so failures are logged under its event
+        self.context = contextvars.copy_context()
+        self.future = asyncio.get_running_loop().create_future()
+
+    def resolve(self, result: DeliveryResult):
+        if not self.future.done():
+            self.future.set_result(result)
+
+
+class AsyncMessageSender():
+    """Outbound Slack Web API pipeline.
+
+    Callers enqueue API calls and get back a future that resolves to a
+    DeliveryResult once one of the worker coroutines has made the call.
+    Calls are paced by a RateLimiter; calls to the same channel are delivered
+    in order, and throttled calls are retried in place after Retry-After.
+
+    With a spool, posts are journaled before they're queued and marked done
+    once Slack accepts or rejects them. A post that failed because Slack was
+    unreachable resolves with that failure and is handed, with every later
+    post to its channel, to a retry task that resends them in order with
+    backoff from `retry_delay` up to `max_retry_delay`; the workers go on
+    with other channels. Posts held back that way resolve straight away
+    with a transient "retry_pending" error, and calls that aren't spooled
+    fail with it. Whatever is left at close is sent by `replay_spool` on
+    the next start.
+    """
+
+    def __init__(self, client: AsyncWebClient, logger=None, workers: int = 2, queue_size: int = 1000,
+                 limiter: RateLimiter = None, max_retries: int = 3, metrics=None, spool: OutboundSpool = None,
+                 retry_delay: float = 5, max_retry_delay: float = 300):
+        self.client = client
+        self.logger = logger or logging.getLogger(__name__)
+        self.workers = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.metrics = metrics
+        self.spool = spool
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.stats = {"sent": 0, "throttled": 0, "retried": 0, "dropped": 0, "replayed": 0}
+        self._channels = {}
+        # channel -> spooled posts waiting for its retry task, oldest first
+        self._retrying = {}
+        self._retry_tasks = set()
+        self._tasks = []
+        self._closing = asyncio.Event()
+
+    def __len__(self):
+        return (self.queue.qsize() + sum(len(pending) for pending in self._channels.values())
+                + sum(len(backlog) for backlog in self._retrying.values()))
+
+    @property
+    def running(self):
+        return any(not t.done() for t in self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def submit(self, method: str, **kwargs) -> asyncio.Future:
+        self.start()
+        job = OutboundMessage(method, kwargs)
+        if self.spool is not None and method in SPOOLED_METHODS:
+            if not self.spool.is_open:
+                # leftovers from the last run go out before anything new
+                await self.replay_spool()
+            try:
+                job.spool_id = await self.spool.add(method, kwargs)
+            except Exception as e:
+                self.logger.error(f"{method} to {job.channel} not spooled, sending anyway: {e}")
+        await self.queue.put(job)
+        return job.future
+
+    async def replay_spool(self) -> int:
+        """Open the spool and queue whatever it still holds from the last run, in order."""
+        if self.spool is None:
+            return 0
+        pending = await self.spool.open()
+        self.start()
+        for spool_id, method, kwargs in pending:
+            job = OutboundMessage(method, kwargs)
+            job.spool_id = spool_id
+            await self.queue.put(job)
+        self.stats["replayed"] += len(pending)
+        if pending:
+            self.logger.info(f"Replaying {len(pending)} undelivered messages from {self.spool.path}")
+        return len(pending)
+
+    async def post_message(self, channel: str, text: str, **kwargs) -> asyncio.Future:
+        return await self.submit("chat.postMessage", channel=channel, text=text, **kwargs)
+
+    async def update_message(self, channel: str, ts: str, text: str, **kwargs) -> asyncio.Future:
+        return await self.submit("chat.update", channel=channel, ts=ts, text=text, **kwargs)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self.queue.get()
+            channel = job.channel
+            if channel in self._retrying:
+                # behind a post that is being retried, so the channel keeps its order
+                self._defer(job)
+                self.queue.task_done()
+                continue
+            if channel in self._channels:
+                # another worker owns this channel and will deliver it in order
+                self._channels[channel].append(job)
+                continue
+            pending = self._channels[channel] = deque([job])
+            try:
+                while pending:
+                    job = pending[0]
+                    try:
+                        result = await self._deliver_in_context(job)
+                        job.resolve(result)
+                    finally:
+                        self.queue.task_done()
+                    pending.popleft()
+                    if job.spool_id is None:
+                        continue
+                    if not result.transient:
+                        self.spool.done(job.spool_id)
+                        continue
+                    self._retrying[channel] = deque([job])
+                    while pending:
+                        self._defer(pending.popleft())
+                        self.queue.task_done()
+                    task = asyncio.create_task(self._retry(channel))
+                    self._retry_tasks.add(task)
+                    task.add_done_callback(self._retry_tasks.discard)
+            except asyncio.CancelledError:
+                for job in pending:
+                    job.resolve(DeliveryResult(job.method, job.channel, error="cancelled"))
+                raise
+            finally:
+                del self._channels[channel]
+
+    def _deliver_in_context(self, job: OutboundMessage):
+        return asyncio.create_task(self._deliver(job), context=job.context)
+
+    def _defer(self, job: OutboundMessage):
+        job.resolve(DeliveryResult(job.method, job.channel, error="retry_pending", transient=True))
+        if job.spool_id is not None:
+            self._retrying[job.channel].append(job)
+            return
+        self.stats["dropped"] += 1
+        self.logger.error(f"{job.method} to {job.channel} failed: an earlier post is being retried")
+
+    async def _retry(self, channel: str):
+        backlog = self._retrying[channel]
+        delay = self.retry_delay
+        try:
+            while backlog:
+                self.logger.warning(f"{len(backlog)} post(s) to {channel} kept in spool, retrying in {delay:g}s")
+                try:
+                    await asyncio.wait_for(self._closing.wait(), delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+                while backlog:
+                    job = backlog[0]
+                    self.stats["retried"] += 1
+                    if (await self._deliver_in_context(job)).transient:
+                        break
+                    self.spool.done(job.spool_id)
+                    backlog.popleft()
+                delay = min(delay * 2, self.max_retry_delay)
+        finally:
+            del self._retrying[channel]
+
+    async def _deliver(self, job: OutboundMessage) -> DeliveryResult:
+        with child_span(job.span, f"slack {job.method}", channel=job.channel) as span:
+            result = await self._call(job, span)
+            if not result.ok:
+                span.set_error(result.error)
+            return result
+
+    async def _call(self, job: OutboundMessage, span) -> DeliveryResult:
+        attempt = 0
+        while True:
+            await self.limiter.acquire(job.method, job.channel)
+            start = time.perf_counter()
+            try:
+                response = await self.client.api_call(job.method, json=job.kwargs)
+                self.stats["sent"] += 1
+                self._observe(job.method, start, "ok")
+                return DeliveryResult(job.method, job.channel, response=response.data)
+            except SlackApiError as e:
+                error = e.response["error"]
+                transient = e.response.status_code >= 500 or error in TRANSIENT_ERRORS
+                self._observe(job.method, start, error)
+                if e.response.status_code == 429:
+                    self.stats["throttled"] += 1
+                    retry_after = float(e.response.headers.get("Retry-After", 1))
+                    self.limiter.throttle(job.method, job.channel, retry_after)
+                    if attempt < self.max_retries:
+                        attempt += 1
+                        self.stats["retried"] += 1
+                        span.set_attribute("retries", attempt)
+                        self.logger.warning(f"{job.method} to {job.channel} throttled, retrying in {retry_after}s")
+                        continue
+            except Exception as e:
+                error = str(e)
+                transient = True
+                self._observe(job.method, start, type(e).__name__)
+            self.stats["dropped"] += 1
+            self.logger.error(f"{job.method} to {job.channel} failed: {error}")
+            return DeliveryResult(job.method, job.channel, error=error, transient=transient)
+
+    def _observe(self, method: str, start: float, status: str):
+        if self.metrics is not None:
+            self.metrics.slack_call(method, time.perf_counter() - start, status)
+
+    async def close(self, drain: bool = True):
+        # stop retrying spooled posts; they are resent on the next start
+        self._closing.set()
+        if drain and self.running:
+            await self.queue.join()
+        for t in [*self._tasks, *self._retry_tasks]:
+            t.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_tasks, return_exceptions=True)
+        self._tasks = []
+        while not self.queue.empty():
+            job = self.queue.get_nowait()
+            job.resolve(DeliveryResult(job.method, job.channel, error="sender closed"))
+            self.queue.task_done()
+        if self.spool is not None:
+            await self.spool.close()
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import closing
+
+
+class SessionStore():
+    """Per-channel LLM sessions, kept in LRU order.
+
+    Sessions idle for longer than `idle_ttl` seconds are dropped, and the
+    least recently used session is evicted once `max_sessions` is reached.
+    Each session keeps at most the last `max_context` context entries, so
+    memory is bounded by max_sessions * max_context.
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 24 * 3600, max_context: int = 50):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_context = max_context
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, channel):
+        session = self._sessions.get(channel)
+        return session is not None and not self._expired(session, time.time())
+
+    def _expired(self, session: dict, now: float) -> bool:
+        return self.idle_ttl is not None and now - session["last_used"] > self.idle_ttl
+
+    def _evict(self, now: float):
+        # LRU order is also last_used order, so expired sessions are at the front
+        while self._sessions:
+            channel, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and not self._expired(session, now):
+                break
+            del self._sessions[channel]
+            self.deleted(channel)
+
+    def get(self, channel: str) -> dict:
+        now = time.time()
+        session = self._sessions.get(channel)
+        if session is None or self._expired(session, now):
+            return self.reset(channel)
+        session["last_used"] = now
+        self._sessions.move_to_end(channel)
+        self.changed(channel, session)
+        return session
+
+    def _trimmed(self, context: list) -> list:
+        return context[max(0, len(context) - self.max_context):]
+
+    def add_context(self, channel: str, entry) -> dict:
+        """Append to a channel's session context, dropping its oldest entries past `max_context`."""
+        session = self.get(channel)
+        session["context"] = self._trimmed(session["context"] + [entry])
+        self.changed(channel, session)
+        return session
+
+    def reset(self, channel: str) -> dict:
+        now = time.time()
+        session = {"session_id": str(uuid.uuid4()), "context": [], "last_used": now}
+        self._sessions[channel] = session
+        self._sessions.move_to_end(channel)
+        self.changed(channel, session)
+        self._evict(now)
+        return session
+
+    def changed(self, channel: str, session: dict):
+        pass
+
+    def deleted(self, channel: str):
+        pass
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """SessionStore that restores sessions on start and writes changes behind.
+
+    Changes are collected in memory and flushed to SQLite every
+    `flush_interval` seconds (and on close) from a worker thread.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5, logger=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._dirty = {}
+        self._flusher = None
+
+    def changed(self, channel: str, session: dict):
+        self._dirty[channel] = session
+
+    def deleted(self, channel: str):
+        self._dirty[channel] = None
+
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                   "channel TEXT PRIMARY KEY, session_id TEXT, context TEXT, last_used REAL)")
+        return db
+
+    def _load(self):
+        with closing(self._connect()) as db, db:
+            rows = db.execute("SELECT channel, session_id, context, last_used FROM sessions "
+                              "ORDER BY last_used DESC LIMIT ?", (self.max_sessions,)).fetchall()
+        return rows
+
+    def _write(self, dirty: dict):
+        # the connection's own context manager only commits; closing() releases it
+        with closing(self._connect()) as db, db:
+            db.executemany("DELETE FROM sessions WHERE channel = ?",
+                           [(c,) for c, s in dirty.items() if s is None])
+            db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                           [(c, s["session_id"], json.dumps(s["context"]), s["last_used"])
+                            for c, s in dirty.items() if s is not None])
+            if self.idle_ttl is not None:
+                db.execute("DELETE FROM sessions WHERE last_used < ?", (time.time() - self.idle_ttl,))
+
+    async def start(self):
+        rows = await asyncio.to_thread(self._load)
+        now = time.time()
+        for channel, session_id, context, last_used in reversed(rows):
+            session = {"session_id": session_id, "context": self._trimmed(json.loads(context)),
+                       "last_used": last_used}
+            if not self._expired(session, now):
+                self._sessions[channel] = session
+        self.logger.info(f"Restored {len(self._sessions)} sessions from {self.path}")
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(f"Failed to flush sessions to {self.path}: {e}")
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        # snapshot the sessions so the thread doesn't race with the event loop
+        dirty = {c: (dict(s, context=list(s["context"])) if s is not None else None) for c, s in dirty.items()}
+        await asyncio.to_thread(self._write, dirty)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
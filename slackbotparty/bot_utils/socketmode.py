@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from slack_bolt.app.async_app import AsyncApp
+from slack_sdk.socket_mode.response import SocketModeResponse
+
+from bot_utils.dedupe import TTLSet
+
+
+class PooledSocketModeHandler(AsyncSocketModeHandler):
+    """One of a pool's connections: acks envelopes the pool has already seen instead of dispatching them."""
+
+    def __init__(self, pool, app: AsyncApp, app_token: str):
+        super().__init__(app=app, app_token=app_token)
+        self.pool = pool
+
+    async def handle(self, client, req):
+        if not self.pool.first_time(req):
+            await client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id))
+            return
+        await super().handle(client, req)
+
+
+class SocketModePool():
+    """Several Socket Mode connections for one app token, feeding one Bolt app.
+
+    Slack spreads an app's envelopes over all of its open connections, so
+    while one reconnects the others keep delivering. Envelopes are
+    deduplicated across connections by envelope_id and event_id (a retry
+    after a reconnect can arrive on a different one) and duplicates are
+    acked without being dispatched.
+
+    Every `refresh_interval` seconds, split evenly across the connections,
+    one of them is replaced: the new connection is opened before the old
+    one is closed, so there is no gap. Listeners in `message_listeners` and
+    `request_listeners` are added to every connection; request listeners
+    run after Bolt's own, which sends the ack. Stands in for
+    AsyncSocketModeHandler: `start_async` / `close_async`.
+    """
+
+    def __init__(self, app: AsyncApp, app_token: str, size: int = 1, refresh_interval: float = 0,
+                 session_factory=None, dedupe_ttl: float = 600, logger=None):
+        self.app = app
+        self.app_token = app_token
+        self.size = max(1, size)
+        self.refresh_interval = refresh_interval
+        self.session_factory = session_factory
+        self.logger = logger or logging.getLogger(__name__)
+        self.message_listeners = []
+        self.request_listeners = []
+        self.handlers = []
+        self.seen = TTLSet(dedupe_ttl)
+        self.stats = {"envelopes": 0, "duplicates": 0, "refreshes": 0}
+        self._refresher = None
+
+    def __len__(self):
+        return len(self.handlers)
+
+    def first_time(self, req) -> bool:
+        keys = [("envelope", req.envelope_id)]
+        if (req.payload or {}).get("event_id"):
+            keys.append(("event", req.payload["event_id"]))
+        if any(k in self.seen for k in keys):
+            self.stats["duplicates"] += 1
+            return False
+        for k in keys:
+            self.seen.add(k)
+        self.stats["envelopes"] += 1
+        return True
+
+    async def _connect(self) -> PooledSocketModeHandler:
+        handler = PooledSocketModeHandler(self, self.app, self.app_token)
+        client = handler.client
+        if self.session_factory is not None:
+            await client.aiohttp_client_session.close()
+            client.aiohttp_client_session = self.session_factory()
+        client.message_listeners.extend(self.message_listeners)
+        client.socket_mode_request_listeners.extend(self.request_listeners)
+        try:
+            await handler.connect_async()
+        except BaseException:
+            await handler.close_async()
+            raise
+        return handler
+
+    async def connect_async(self):
+        # one at a time: apps.connections.open is heavily rate limited
+        while len(self.handlers) < self.size:
+            self.handlers.append(await self._connect())
+        self.logger.info(f"Connected {len(self.handlers)} Socket Mode connection(s)")
+
+    async def replace(self, index: int):
+        new = await self._connect()
+        old, self.handlers[index] = self.handlers[index], new
+        await old.close_async()
+        self.stats["refreshes"] += 1
+
+    async def _refresh(self):
+        step = self.refresh_interval / self.size
+        index = 0
+        while True:
+            await asyncio.sleep(step)
+            try:
+                await self.replace(index)
+            except Exception as e:
+                self.logger.warning(f"Failed to refresh Socket Mode connection {index}: {e}")
+            index = (index + 1) % self.size
+
+    async def start_async(self):
+        await self.connect_async()
+        if self.refresh_interval:
+            self._refresher = asyncio.create_task(self._refresh())
+        await asyncio.sleep(float("inf"))
+
+    async def close_async(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+        handlers, self.handlers = self.handlers, []
+        await asyncio.gather(*(handler.close_async() for handler in handlers), return_exceptions=True)
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+
+class OutboundSpool():
+    """Append-only journal of outbound API calls, so they survive a crash or an outage.
+
+    Each call is journaled before it is sent and marked done once Slack has
+    answered (or rejected it for good). Journal writes are group-committed:
+    every call waiting on `add` at the same time shares one write and one
+    fsync. "done" marks aren't waited on; losing one only means that call
+    is sent again after a restart.
+
+    `open` returns the calls that were never marked done, oldest first, and
+    rewrites the file with just those. Once the file passes `compact_bytes`
+    and is mostly done entries, it is rewritten the same way while running.
+    """
+
+    def __init__(self, path: str, compact_bytes: int = 10 * 1024 * 1024, logger=None):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.stats = {"added": 0, "done": 0, "commits": 0, "compactions": 0}
+        # id -> journal line of every call not yet marked done
+        self.pending = {}
+        self._next_id = 1
+        self._lines = []
+        self._waiters = []
+        self._wakeup = asyncio.Event()
+        self._file = None
+        self._task = None
+        self._stopping = False
+        self._opening = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._task is not None
+
+    def _load(self):
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # a torn last line from a crash mid-write
+                        continue
+                    if record.get("done"):
+                        entries.pop(record["id"], None)
+                    else:
+                        entries[record["id"]] = record
+                    self._next_id = max(self._next_id, record["id"] + 1)
+        pending = [entries[i] for i in sorted(entries)]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in pending:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return pending
+
+    async def open(self) -> list:
+        """Start the journal; returns [(id, method, kwargs)] for calls still to be delivered.
+
+        Only the first call loads anything; later ones return [].
+        """
+        async with self._opening:
+            if self.is_open:
+                return []
+            pending = await asyncio.to_thread(self._load)
+            self.pending = {record["id"]: json.dumps(record) + "\n" for record in pending}
+            self._stopping = False
+            self._task = asyncio.create_task(self._writer())
+        return [(record["id"], record["method"], record["args"]) for record in pending]
+
+    async def add(self, method: str, kwargs: dict) -> int:
+        """Journal a call; returns its id once it is on disk."""
+        if not self.is_open:
+            raise RuntimeError(f"outbound spool {self.path} is not open")
+        spool_id = self._next_id
+        line = json.dumps({"id": spool_id, "method": method, "args": kwargs, "t": time.time()}) + "\n"
+        self._next_id += 1
+        self.pending[spool_id] = line
+        self.stats["added"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._lines.append(line)
+        self._waiters.append(waiter)
+        self._wakeup.set()
+        await waiter
+        return spool_id
+
+    def done(self, spool_id: int):
+        if spool_id not in self.pending:
+            return
+        del self.pending[spool_id]
+        self.stats["done"] += 1
+        self._lines.append(json.dumps({"id": spool_id, "done": True}) + "\n")
+        self._wakeup.set()
+
+    def _write(self, lines, sync: bool, live: list = None):
+        if live is None:
+            self._file.write("".join(lines))
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            return
+        # `live` is every pending call as of this batch, so it replaces the batch too
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("".join(live))
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.stats["compactions"] += 1
+
+    async def _commit(self):
+        lines, waiters = self._lines, self._waiters
+        self._lines, self._waiters = [], []
+        live = None
+        size = self._file.tell()
+        if size > self.compact_bytes:
+            live = list(self.pending.values())
+            if sum(len(line) for line in live) * 2 > size:
+                # mostly calls still pending: rewriting would hardly shrink it
+                live = None
+        try:
+            await asyncio.to_thread(self._write, lines, bool(waiters), live)
+            self.stats["commits"] += 1
+        except asyncio.CancelledError:
+            # the write may still land, but nobody would ever tell these callers
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(RuntimeError(f"outbound spool {self.path} closed mid-write"))
+            raise
+        except Exception as e:
+            self.logger.error(f"Failed to write outbound spool {self.path}: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _writer(self):
+        while not self._stopping:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._lines:
+                await self._commit()
+
+    async def close(self):
+        if self._task is not None:
+            # let a commit in progress finish, so its callers get their answer
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._file is not None:
+            if self._lines:
+                await self._commit()
+            self._file.close()
+            self._file = None
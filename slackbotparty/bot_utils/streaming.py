@@ -0,0 +1,71 @@
+import time
+
+from bot_utils.sender import AsyncMessageSender, DeliveryResult
+
+
+class StreamingReply():
+    """Renders a streamed reply into one Slack message.
+
+    A placeholder is posted first, then the message is edited with
+    chat.update as text arrives. Edits are coalesced: at most one update is
+    in flight and updates are at least `min_interval` seconds apart, so a
+    fast stream costs a handful of API calls rather than one per chunk.
+    """
+
+    def __init__(self, sender: AsyncMessageSender, channel: str, placeholder: str = "_thinking..._",
+                 min_interval: float = 1.5):
+        self.sender = sender
+        self.channel = channel
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.text = ""
+        self.ts = None
+        self._sent_text = None
+        self._last_update = 0.0
+        self._in_flight = None
+
+    async def start(self) -> DeliveryResult:
+        result = await (await self.sender.post_message(self.channel, self.placeholder))
+        if result.ok:
+            self.ts = result.ts
+            self._last_update = time.monotonic()
+        return result
+
+    async def append(self, chunk: str):
+        self.text += chunk
+        if self._in_flight is not None and not self._in_flight.done():
+            return
+        if time.monotonic() - self._last_update < self.min_interval:
+            return
+        await self._update()
+
+    async def _update(self):
+        if self.ts is None or not self.text or self.text == self._sent_text:
+            return
+        self._sent_text = self.text
+        self._last_update = time.monotonic()
+        self._in_flight = await self.sender.update_message(self.channel, self.ts, self.text)
+
+    async def finish(self, text: str = None) -> DeliveryResult:
+        """Flush the final text, waiting for any in-flight edit first."""
+        if text is not None:
+            self.text = text
+        if self._in_flight is not None:
+            await self._in_flight
+        if self.ts is None:
+            # the placeholder never made it; fall back to a plain post
+            return await (await self.sender.post_message(self.channel, self.text or self.placeholder))
+        if not self.text:
+            self.text = "(empty response)"
+        if self.text != self._sent_text:
+            await self._update()
+        return await self._in_flight
+
+    async def render(self, chunks) -> DeliveryResult:
+        await self.start()
+        try:
+            async for chunk in chunks:
+                await self.append(chunk)
+        except Exception as e:
+            return await self.finish(f"{self.text}\n\nerror calling LLM app: {e}".strip())
+        return await self.finish()
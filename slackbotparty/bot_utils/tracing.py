@@ -0,0 +1,285 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+
+import aiohttp
+
+# the span new spans are parented to; None when nothing is being traced
+current_span = ContextVar("current_span", default=None)
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span():
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "end_ns",
+                 "status", "message", "_token")
+
+    def __init__(self, tracer, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_UNSET
+        self.message = None
+        self._token = None
+
+    def child(self, name: str, **attributes):
+        return Span(self.tracer, name, self.trace_id, self.span_id, attributes)
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.message = message
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer.finished(self)
+
+    def __enter__(self):
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current_span.reset(self._token)
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        self.end()
+        return False
+
+
+class NoopSpan():
+    """Stands in for a span when tracing is off or the trace wasn't sampled."""
+    __slots__ = ()
+
+    def child(self, name: str, **attributes):
+        return NOOP_SPAN
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class UnsampledSpan(NoopSpan):
+    """Root of a trace that sampling skipped; made current so its children are skipped too."""
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current_span.reset(self._token)
+        return False
+
+
+def child_span(parent, name: str, **attributes):
+    """A child of `parent`, or a no-op span if there is no parent."""
+    if parent is None:
+        return NOOP_SPAN
+    return parent.child(name, **attributes)
+
+
+def _value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_json(spans, service_name: str) -> dict:
+    """An OTLP/HTTP JSON ExportTraceServiceRequest for finished spans."""
+    encoded = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _value(v)} for k, v in span.attributes.items()],
+            "status": {"code": span.status},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        if span.message:
+            item["status"]["message"] = span.message
+        encoded.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "slackbotparty"}, "spans": encoded}],
+    }]}
+
+
+class FileSpanExporter():
+    """Appends one OTLP JSON export request per batch to a JSONL file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, line: str):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    async def export(self, request: dict):
+        await asyncio.to_thread(self._write, json.dumps(request))
+
+    async def close(self):
+        pass
+
+
+class OTLPHttpExporter():
+    """POSTs OTLP JSON to a collector, e.g. http://localhost:4318/v1/traces."""
+
+    def __init__(self, endpoint: str, timeout: float = 10):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._session = None
+
+    async def export(self, request: dict):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        async with self._session.post(self.endpoint, json=request) as response:
+            response.raise_for_status()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class Tracer():
+    """Collects spans for one bot and exports them in batches.
+
+    With no exporter every span is NOOP_SPAN, so instrumented code costs a
+    method call. Finished spans are buffered and exported every
+    `flush_interval` seconds, or sooner once `batch_size` have piled up;
+    past `max_buffer` new spans are dropped rather than growing memory.
+    """
+
+    def __init__(self, service_name: str, exporter=None, sample_rate: float = 1.0, flush_interval: float = 5,
+                 batch_size: int = 512, max_buffer: int = 10000, logger=None):
+        self.service_name = service_name
+        self.exporter = exporter
+        self.enabled = exporter is not None
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.logger = logger or logging.getLogger(__name__)
+        self.stats = {"spans": 0, "exported": 0, "dropped": 0}
+        self._buffer = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start_span(self, name: str, parent=None, **attributes):
+        """A span under `parent` (default: the current span); a new trace if there is none."""
+        if not self.enabled:
+            return NOOP_SPAN
+        if parent is None:
+            parent = current_span.get()
+        if parent is not None:
+            return parent.child(name, **attributes)
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return UnsampledSpan()
+        return Span(self, name, os.urandom(16).hex(), attributes=attributes)
+
+    span = start_span
+
+    def handoff(self, fn, name: str = None):
+        """Wrap a coroutine function queued now and run later so it is traced under the current span.
+
+        The span is pinned even when it isn't a recorded one (unsampled, or
+        none at all), so the job can't pick up some other event's span.
+        """
+        if not self.enabled:
+            return fn
+        parent = current_span.get()
+        queued_ns = time.time_ns()
+
+        @functools.wraps(fn)
+        async def traced(*args):
+            if not isinstance(parent, Span):
+                token = current_span.set(parent)
+                try:
+                    await fn(*args)
+                finally:
+                    current_span.reset(token)
+                return
+            with parent.child(name or fn.__name__) as span:
+                span.set_attribute("queue_wait_ms", round((span.start_ns - queued_ns) / 1e6, 3))
+                await fn(*args)
+        return traced
+
+    def finished(self, span: Span):
+        self.stats["spans"] += 1
+        if len(self._buffer) >= self.max_buffer:
+            self.stats["dropped"] += 1
+            return
+        self._buffer.append(span)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            try:
+                await self.exporter.export(otlp_json(batch, self.service_name))
+                self.stats["exported"] += len(batch)
+            except Exception as e:
+                self.stats["dropped"] += len(batch)
+                self.logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.enabled:
+            await self.flush()
+            await self.exporter.close()
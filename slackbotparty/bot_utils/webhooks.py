@@ -0,0 +1,136 @@
+import asyncio
+import ipaddress
+import logging
+import aiohttp
+from aiohttp import web
+
+
+def payload_items(data) -> list:
+    """A webhook body may carry one event or a list of them."""
+    items = data if isinstance(data, list) else [data]
+    return [item for item in items if item]
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class WebhookReceiver():
+    """Local HTTP endpoint that webhook sources can push events to directly.
+
+    POST {path} with a JSON body (an object or a list of objects). If a secret
+    is configured, requests must carry it in the X-Webhook-Secret header.
+    Without one it only listens on a loopback address.
+    """
+
+    def __init__(self, queue: asyncio.Queue, host: str = "127.0.0.1", port: int = 8080, path: str = "/webhook",
+                 secret: str = None, logger=None):
+        if not secret and not is_loopback(host):
+            raise ValueError(f"Refusing to accept webhooks on {host} without a secret; set WEBHOOK_SECRET")
+        self.queue = queue
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret = secret
+        self.logger = logger or logging.getLogger(__name__)
+        self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret and request.headers.get("X-Webhook-Secret") != self.secret:
+            return web.json_response({"ok": False, "error": "invalid_secret"}, status=401)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.json_response({"ok": False, "error": "invalid_json"}, status=400)
+        items = payload_items(data)
+        if self.queue.maxsize and self.queue.qsize() + len(items) > self.queue.maxsize:
+            return web.json_response({"ok": False, "error": "busy"}, status=503, headers={"Retry-After": "1"})
+        for item in items:
+            self.queue.put_nowait(item)
+        return web.json_response({"ok": True, "queued": len(items)}, status=202)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.logger.info(f"Listening for webhooks on http://{self.host}:{self.port}{self.path}")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class WebhookPoller():
+    """Polls a webhook relay URL without blocking the event loop.
+
+    After a poll returns data the relay is polled again straight away; empty
+    polls and errors back off exponentially up to `max_interval`. With
+    `long_poll` set, the wait is passed to the relay as `?wait=` so it can
+    hold the request open until an event arrives.
+    """
+
+    def __init__(self, url: str, queue: asyncio.Queue, min_interval: float = 0.5, max_interval: float = 5,
+                 long_poll: float = None, timeout: float = 30, logger=None, connector: aiohttp.BaseConnector = None):
+        self.url = url
+        self.queue = queue
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.long_poll = long_poll
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.connector = connector
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(total=self.timeout + (self.long_poll or 0))
+            self._session = aiohttp.ClientSession(timeout=timeout, connector=self.connector,
+                                                  connector_owner=self.connector is None)
+        return self._session
+
+    async def poll_once(self) -> int:
+        params = {"wait": str(self.long_poll)} if self.long_poll else None
+        async with self.session.get(self.url, params=params) as response:
+            if response.status == 200:
+                data = await response.json(content_type=None)
+                if data:
+                    return await self._put(data)
+                return 0
+            if response.status != 204:
+                raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+            return 0
+
+    async def _put(self, data) -> int:
+        items = payload_items(data)
+        for item in items:
+            await self.queue.put(item)
+        return len(items)
+
+    async def run(self):
+        delay = self.min_interval
+        while True:
+            try:
+                if await self.poll_once():
+                    delay = 0
+                else:
+                    delay = min(self.max_interval, max(self.min_interval, delay * 2))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Exception in webhook polling: {e}")
+                delay = self.max_interval
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
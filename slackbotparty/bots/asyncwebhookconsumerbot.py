@@ -1,118 +1,91 @@
-import logging, asyncio, requests
+import asyncio
 from bots.basebot import BaseBotAsync
+from bot_utils.webhooks import WebhookPoller, WebhookReceiver
+from bot_utils.digest import AlertAggregator
 
 class AsyncWebhookConsumerBot(BaseBotAsync):
-    def __init__(self, options, secrets):
-        super().__init__(options, secrets)
-        self._options = {**options, **secrets}
-        self.webhook_url = self._options['extras']["webhookUrl"]
-        self.httpClient = requests.Session()
-
+    listens_to_messages = False
 
-    async def poll_webhook(self):
+    def __init__(self, options, secrets, resources=None):
+        super().__init__(options, secrets, resources)
+        self._options = {**options, **secrets}
+        extras = self._options.get('extras', {})
+        self.webhook_url = extras.get("webhookUrl")
+        # "poll" the relay URL, accept "push"ed events on a local port, or "both"
+        self.webhook_mode = extras.get("webhookMode", "poll" if self.webhook_url else "push")
+        self.webhook_queue = asyncio.Queue(maxsize=extras.get("webhookQueueSize", 1000))
+        self.webhook_sources = []
+        if self.webhook_mode in ("poll", "both"):
+            self.webhook_sources.append(WebhookPoller(
+                self.webhook_url,
+                self.webhook_queue,
+                max_interval=extras.get("webhookPollMaxInterval", 5),
+                long_poll=extras.get("webhookLongPollSeconds"),
+                logger=self.logger,
+                connector=self.resources.connector,
+            ))
+        if self.webhook_mode in ("push", "both"):
+            self.webhook_sources.append(WebhookReceiver(
+                self.webhook_queue,
+                host=extras.get("webhookHost", "127.0.0.1"),
+                port=extras.get("webhookPort", 8080),
+                path=extras.get("webhookPath", "/webhook"),
+                secret=self._options.get("WEBHOOK_SECRET"),
+                logger=self.logger,
+            ))
+        self.aggregator = None
+        digest = extras.get("digest")
+        if digest and digest.get("windowSeconds", 0) > 0:
+            self.aggregator = AlertAggregator(
+                self.send_message,
+                window=digest["windowSeconds"],
+                fields=digest.get("fingerprintFields", ["message"]),
+                max_lines=digest.get("maxLines", 10),
+                leading_edge=digest.get("postFirstAlert", True),
+            )
+
+
+    async def consume_webhooks(self):
         while True:
+            data = await self.webhook_queue.get()
             try:
-                response = self.httpClient.get(self.webhook_url)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data:
-                        await self.handle_webhook(data)
-                elif response.status_code == 204:
-                    pass
-                    # self.logger.info("No new data from webhook")
-                else:
-                    self.logger.error(f"Error fetching webhook: {response.status}")
+                with self.tracer.span("webhook"):
+                    await self.handle_webhook(data)
             except Exception as e:
-                self.logger.error(f"Exception in webhook polling: {e}")
-            await asyncio.sleep(5)  # Poll every 5 seconds
+                self.logger.error(f"Exception handling webhook: {e}")
+            finally:
+                self.webhook_queue.task_done()
 
     async def start_async(self):
-        self.logger.info(self._options["online_message"])
-        await self.send_startup_message(self._options["default_channel"])
+        await self.open()
+        if self._options.get("online_message"):
+            await self.announce_online()
         # await self.handler.start_async()
-        await self.poll_webhook()
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for source in self.webhook_sources:
+                    if isinstance(source, WebhookPoller):
+                        tg.create_task(source.run())
+                    else:
+                        await source.start()
+                tg.create_task(self.consume_webhooks())
+        finally:
+            for source in self.webhook_sources:
+                await source.close()
+            if self.aggregator is not None:
+                await self.aggregator.close()
+            await self.close()
 
     async def handle_webhook(self, data):
         # Process the webhook data
         channel = data.get('channel')
         message = data.get('message')
-        if channel and message:
-            await self.send_message(channel, message)
+        if not (channel and message):
+            channel = self._options["default_channel"]
+            message = f"Ut oh, got a webhook,  <@poppy> can you check it out?\n<@poppy> {data}"
+        if self.aggregator is not None:
+            await self.aggregator.add(channel, message, data)
         else:
-            await self.send_message(self._options["default_channel"], "Ut oh, got a webhook,  <@poppy> can you check it out?")
-            await self.send_message(self._options["default_channel"], f"<@poppy> {data}")
+            await self.send_message(channel, message)
     
 
-    def register_event_handlers(self):
-        
-        @self.app.event("app_mention")
-        async def handle_event(body, say, logger):
-            message = body['event']['text']
-            channel = body['event']['channel']
-            user = body['event']['user']
-            team = body['team_id']
-
-            extra = {'team': team, 'channel': channel, 'user': user}
-            adapter = logging.LoggerAdapter(self.logger, extra)
-
-            adapter.info(f"Received app_mention: {message}")
-
-            if not AsyncSlackBot.should_process_event(body, self):
-                return
-
-            if message.find('rollcall') != -1:
-                await self.send_message(channel, f"I'm here! (from <@{body['event']['user']}>)")
-            elif message.find('reset') != -1:
-                self.reset_state(channel)
-                await self.send_message(channel, f"State reset! (from <@{body['event']['user']}>)")
-            else:
-                try:
-                    adapter.info("calling LLM app")
-                    llm_res = await self.call_llm_app(message, channel)
-                    adapter.info(f"Got response back from LLM app")
-                    message = llm_res["response"]["content"]
-                    await self.send_message(channel, message)
-                except Exception as e:
-                    await self.send_message(channel, "error calling LLM app: " + str(e))
-
-        @self.app.command('/toggle')
-        async def mute(ack, body, logger):
-            await ack()
-            self.muted = not self.muted
-            status = "muted" if self.muted else "unmuted"
-            await self.send_message(body['channel_id'], f"I'm now {status} ! (from <@{body['user_id']}>)")
-
-        @self.app.command('/botstatus')
-        async def check_status(ack, body, logger):
-            await ack()
-            status = "muted" if self.muted else "unmuted"
-            await self.send_message(body['channel_id'], f"I'm {status} ! (from <@{body['user_id']}>)")
-
-
-        @self.app.command('/ping')
-        async def call_ping(ack, body, logger):
-            await ack()
-            await self.send_message(body['channel_id'], f"Pong! (from <@{body['user_id']}>)")
-
-        @self.app.command('/rollcall')
-        async def call_rollcall(ack, body, logger):
-            await ack()
-            
-            message = body['event']['text']
-            channel = body['event']['channel']
-            user = body['event']['user']
-            team = body['team_id']
-
-            extra = {'team': team, 'channel': channel, 'user': user}
-            logger = logging.LoggerAdapter(self.logger, extra)
-
-            logger.info(f"Received command /rollcall: {message}")
-
-            await self.send_message(body['channel_id'], f"I'm here! (from <@{body['user_id']}>)")
-            await self.send_message(body['channel_id'], f"@channel, rollcall! (from <@{body['user_id']}>)")
-
-    async def send_startup_message(self, channel: str):
-        await self.send_message(channel, self._options["online_message"])
-        
-        
-        
\ No newline at end of file
@@ -1,25 +1,73 @@
 from slack_bolt.app.async_app import AsyncApp
-from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
-import logging
-from logging.handlers import RotatingFileHandler
-import aiohttp
-import uuid
-from slack_sdk.errors import SlackApiError
-from slack_sdk import WebClient
-
-from bot_utils import ContextFilter
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot_utils.resources import ResourceHub
+from bot_utils import bind_log_context, get_bot_logger
+from bot_utils.sender import AsyncMessageSender
+from bot_utils.spool import OutboundSpool
+from bot_utils.directory import Directory
+from bot_utils.broadcast import BroadcastResult, broadcast
+from bot_utils.socketmode import SocketModePool
+from bot_utils.llm import LLMClient, CircuitBreaker
+from bot_utils.llm_cache import CachedLLMClient
+from bot_utils.streaming import StreamingReply
+from bot_utils.sessions import SessionStore, SQLiteSessionStore
+from bot_utils.commands import CommandRouter
+from bot_utils.filters import EventFilter
+from bot_utils.recorder import EventRecorder
+from bot_utils.dedupe import EventDeduper, TTLSet, shared_deduper
+from bot_utils.tracing import Tracer, FileSpanExporter, OTLPHttpExporter, current_span
+from bot_utils.metrics import BotMetrics, acquire_metrics_server, release_metrics_server, loop_lag
+from bot_utils.dispatch import EventDispatcher, PRIORITY_COMMAND, PRIORITY_MESSAGE, PRIORITY_LLM
 
 
 class BaseBotAsync():
-    def __init__(self, options, secrets):
+    listens_to_messages = True
+    # text commands: name -> keywords, handled by command_<name>; bots can
+    # add, rename or disable (null) them with "commands" in bot_definitions
+    default_commands = {
+        "rollcall": ["rollcall", "roll call"],
+        "reset": ["reset"],
+    }
+
+    def __init__(self, options, secrets, resources: ResourceHub = None):
         self._options = {**options, **secrets}
+        # bots in one process normally share a hub; one made here is ours to close
+        self._owns_resources = resources is None
+        self.resources = resources or ResourceHub()
         self.__token = self._options["SLACK_BOT_TOKEN"]
-        self.state = {}
         self.name = self._options["name"]
         self.logger = self.create_logger()
+        self.tracer = self.create_tracer()
+        self.metrics = BotMetrics(self.name)
+        self.metrics_server = None
+        self.sessions = self.create_session_store()
+        self.router = CommandRouter({**self.default_commands, **self._options.get("commands", {})})
+        # the bots running in this process, set by run_bots; /rollcall answers for all of them
+        self.peers = [self]
+        # set by the supervisor's workers: relay(channel, text) has the bots in
+        # the other worker processes answer a /rollcall too
+        self.rollcall_relay = None
         self.__init()
         self.muted = False
-        self.llm_app_url = 'https://chatapi.apps.shaut.us'
+        self.llm_app_url = self._options.get("llm_app_url", 'https://chatapi.apps.shaut.us')
+        self.llm = CachedLLMClient(
+            LLMClient(
+                self.llm_app_url,
+                max_in_flight=self._options.get("llm_max_in_flight", 8),
+                timeout=self._options.get("llm_timeout", 60),
+                breaker=CircuitBreaker(
+                    failure_threshold=self._options.get("llm_failure_threshold", 5),
+                    reset_timeout=self._options.get("llm_reset_timeout", 30),
+                ),
+                connector=self.resources.connector,
+            ),
+            ttl=self._options.get("llm_cache_ttl", 0),
+            max_entries=self._options.get("llm_cache_size", 256),
+            scope=self._options.get("llm_cache_scope", "session"),
+            # mentions are expanded after the cache key is taken, so hits don't depend on the directory
+            rewrite=self.directory.expand_mentions if self.directory is not None else None,
+        )
 
 
     @staticmethod
@@ -30,29 +78,118 @@ class BaseBotAsync():
 
 
     def __init(self):
-        self.client = WebClient(token=self.__token)
-        self.app = AsyncApp(token=self.__token)
-        self.handler = AsyncSocketModeHandler(app=self.app, app_token=self._options["SLACK_APP_TOKEN"])
+        self.client = self.resources.web_client(self.__token,
+                                                base_url=self._options.get("slack_api_url", AsyncWebClient.BASE_URL))
+        self.app = AsyncApp(client=self.client)
+        spool = None
+        if self._options.get("spool_path"):
+            # e.g. "spool/{name}.jsonl"; posts left in it are resent on the next start
+            spool = OutboundSpool(self._options["spool_path"].format(name=self.name), logger=self.logger)
+        self.sender = AsyncMessageSender(
+            self.client,
+            logger=self.logger,
+            workers=self._options.get("send_workers", 2),
+            queue_size=self._options.get("send_queue_size", 1000),
+            max_retries=self._options.get("send_max_retries", 3),
+            metrics=self.metrics,
+            spool=spool,
+            retry_delay=self._options.get("send_retry_delay", 5),
+            max_retry_delay=self._options.get("send_max_retry_delay", 300),
+        )
+        self.directory = None
+        if self._options.get("directory", False):
+            self.directory = Directory(
+                self.client,
+                # e.g. "cache/{name}-directory.json"; a fresh one saves the bulk load on restart
+                snapshot_path=self._options.get("directory_snapshot", "").format(name=self.name) or None,
+                max_age=self._options.get("directory_max_age", 24 * 3600),
+                channel_types=self._options.get("directory_channel_types", "public_channel"),
+                limiter=self.sender.limiter,
+                logger=self.logger,
+            )
+        self.dispatcher = EventDispatcher(
+            workers=self._options.get("dispatch_workers", 4),
+            max_queue=self._options.get("dispatch_queue_size", 100),
+            policy=self._options.get("dispatch_shed_policy", "busy"),
+            logger=self.logger,
+        )
+        self.metrics.watch_queue("dispatch", lambda: len(self.dispatcher))
+        self.metrics.watch_queue("outbound", lambda: len(self.sender))
+        self.metrics.watch_dispatcher(self.dispatcher)
+        if self._options.get("dedupe_shared", False):
+            self.deduper = shared_deduper()
+        else:
+            self.deduper = EventDeduper(ttl=self._options.get("dedupe_ttl", 600))
+        self.event_filter = EventFilter.from_options(self._options)
+        # channels told "busy" recently; shedding load mustn't queue a post per shed event
+        self._busy_replied = TTLSet(ttl=self._options.get("busy_reply_interval", 60))
+        self.handler = SocketModePool(
+            self.app,
+            self._options["SLACK_APP_TOKEN"],
+            size=self._options.get("socket_connections", 1),
+            refresh_interval=self._options.get("socket_refresh_interval", 0),
+            session_factory=self.resources.client_session,
+            dedupe_ttl=self._options.get("dedupe_ttl", 600),
+            logger=self.logger,
+        )
+        self.recorder = None
+        if self._options.get("record_events"):
+            # e.g. "recordings/{name}.jsonl"; replay with replay.py
+            self.recorder = EventRecorder(self._options["record_events"].format(name=self.name),
+                                          redact_text=self._options.get("record_redact_text", False))
+            self.handler.message_listeners.append(self.recorder.listener())
+        if self.tracer.enabled:
+            self.trace_socket_mode()
         self.register_event_handlers()
 
     def create_logger(self):
-        logger = logging.getLogger(self.name)
-        logger.setLevel(logging.INFO)
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(team)s - %(channel)s - %(user)s - %(levelname)s - %(message)s')
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
-
-        # add file logger to logs/{self.name}.log, rotate every 10mb and new file on every start
-        fh = RotatingFileHandler(f'logs/{self.name}.log', maxBytes=10*1024*1024, backupCount=5)   
-        fh.setLevel(logging.INFO)
-        fh.setFormatter(formatter)
-        logger.addHandler(fh)
-
-        logger.addFilter(ContextFilter())
-        return logger
-    
+        return get_bot_logger(self.name)
+
+    def create_tracer(self):
+        exporter = None
+        if self._options.get("trace_otlp_endpoint"):
+            exporter = OTLPHttpExporter(self._options["trace_otlp_endpoint"])
+        elif self._options.get("trace_file"):
+            exporter = FileSpanExporter(self._options["trace_file"].format(name=self.name))
+        return Tracer(self.name, exporter, sample_rate=self._options.get("trace_sample_rate", 1.0), logger=self.logger)
+
+    def trace_socket_mode(self):
+        """Open a span per Socket Mode envelope, from receipt until Bolt has acked it."""
+
+        async def on_receive(client, message: dict, raw_message: str):
+            if not message.get("envelope_id"):
+                return
+            payload = message.get("payload") or {}
+            event = payload.get("event") or {}
+            name = event.get("type") or payload.get("command") or message.get("type")
+            # listeners run in this task and Bolt copies its context, so
+            # the handlers see this span as their parent
+            current_span.set(self.tracer.start_span(f"socket {name}", envelope_type=message.get("type"),
+                                                    event_id=payload.get("event_id", ""),
+                                                    retry_attempt=message.get("retry_attempt", 0)))
+
+        async def on_acked(client, request):
+            span = current_span.get()
+            if span is not None:
+                span.end()
+
+        self.handler.message_listeners.insert(0, on_receive)
+        # runs after Bolt's own request listener, which sends the ack
+        self.handler.request_listeners.append(on_acked)
+
+    def create_session_store(self):
+        kwargs = {
+            "max_sessions": self._options.get("session_max", 1000),
+            "idle_ttl": self._options.get("session_idle_ttl", 24 * 3600),
+            "max_context": self._options.get("session_max_context", 50),
+        }
+        if self._options.get("session_db"):
+            return SQLiteSessionStore(self._options["session_db"], logger=self.logger, **kwargs)
+        return SessionStore(**kwargs)
+
+    @property
+    def default_channel(self) -> str:
+        return self._options["default_channel"]
 
     def mute(self):
         self.muted = True
@@ -62,140 +199,266 @@ class BaseBotAsync():
 
 
     def register_event_handlers(self):
-        @self.app.event("message")
-        async def handle_message(body, logger):
-            message = body['event']['text']
-            channel = body['event']['channel']
-            user = body['event']['user']
-            team = body['team_id']
-
-            extra = {'team': team, 'channel': channel, 'user': user}
-            adapter = logging.LoggerAdapter(self.logger, extra)
-
-            adapter.info(f"Received message: {message}")
-            if not AsyncSlackBot.should_process_event(body, self):
-                return
-
-            if message.find('rollcall') != -1:
-                await self.send_message(channel, f"I'm here! (from <@{body['event']['user']}>)")
-            elif message.find('reset') != -1:
-                self.reset_state(channel)
-                await self.send_message(channel, f"State reset! (from <@{body['event']['user']}>)")
-            else:
-                await self.send_message(channel, f"What's up? (from <@{body['event']['user']}>)")
+        # Listeners only queue work: events are acked right away and the
+        # handlers run on the dispatcher's workers.
+        handle_message = self.metrics.timed(self.handle_message)
+        handle_event = self.metrics.timed(self.handle_event)
+        if self.listens_to_messages:
+            @self.app.event("message")
+            async def on_message(body):
+                if not self.event_filter.accept_message(body['event']) or not self.should_process_event(body, self):
+                    return
+                if not self.first_time(body):
+                    return
+                # only say "busy" where the bot would have answered
+                event = body['event']
+                replies = (self._options.get("can_reply_to_all_messages", False)
+                           or self.router.route(event.get('text', '')) is not None)
+                self.dispatcher.submit(PRIORITY_MESSAGE, self.tracer.handoff(handle_message), body,
+                                       on_shed=(lambda: self.send_busy(event['channel'])) if replies else None)
 
         @self.app.event("app_mention")
-        async def handle_event(body, say, logger):
-            message = body['event']['text']
-            channel = body['event']['channel']
-            user = body['event']['user']
-            team = body['team_id']
-
-            extra = {'team': team, 'channel': channel, 'user': user}
-            adapter = logging.LoggerAdapter(self.logger, extra)
-
-            adapter.info(f"Received app_mention: {message}")
-
-            if not AsyncSlackBot.should_process_event(body, self):
+        async def on_app_mention(body):
+            if not self.should_process_event(body, self):
                 return
+            if not self.first_time(body):
+                return
+            self.dispatcher.submit(PRIORITY_LLM, self.tracer.handoff(handle_event), body,
+                                   on_shed=lambda: self.send_busy(body['event']['channel']))
+
+        # the shared manifest subscribes every bot to these; without a directory they're just acked
+        async def on_directory_event(body):
+            if self.directory is not None:
+                self.directory.handle_event(body['event'])
+
+        for event in Directory.EVENTS:
+            self.app.event(event)(on_directory_event)
+
+        commands = {
+            '/toggle': self.toggle_mute,
+            '/botstatus': self.check_status,
+            '/ping': self.call_ping,
+            '/rollcall': self.call_rollcall,
+        }
+        for command, handler in commands.items():
+            self.app.command(command)(self._command_listener(self.metrics.timed(handler, command)))
 
-            if message.find('rollcall') != -1:
-                await self.send_message(channel, f"I'm here! (from <@{body['event']['user']}>)")
-            elif message.find('reset') != -1:
-                self.reset_state(channel)
-                await self.send_message(channel, f"State reset! (from <@{body['event']['user']}>)")
-            else:
-                try:
-                    adapter.info("calling LLM app")
-                    llm_res = await self.call_llm_app(message, channel)
-                    adapter.info(f"Got response back from LLM app")
-                    message = llm_res["response"]["content"]
-                    await self.send_message(channel, message)
-                except Exception as e:
-                    await self.send_message(channel, "error calling LLM app: " + str(e))
-
-        @self.app.command('/toggle')
-        async def mute(ack, body, logger):
-            await ack()
-            self.muted = not self.muted
-            status = "muted" if self.muted else "unmuted"
-            await self.send_message(body['channel_id'], f"I'm now {status} ! (from <@{body['user_id']}>)")
-
-        @self.app.command('/botstatus')
-        async def check_status(ack, body, logger):
-            await ack()
-            status = "muted" if self.muted else "unmuted"
-            await self.send_message(body['channel_id'], f"I'm {status} ! (from <@{body['user_id']}>)")
-
-
-        @self.app.command('/ping')
-        async def call_ping(ack, body, logger):
-            await ack()
-            await self.send_message(body['channel_id'], f"Pong! (from <@{body['user_id']}>)")
-
-        @self.app.command('/rollcall')
-        async def call_rollcall(ack, body, logger):
+    def _command_listener(self, handler):
+        async def on_command(ack, body):
             await ack()
-            
-            message = body['event']['text']
-            channel = body['event']['channel']
-            user = body['event']['user']
-            team = body['team_id']
-
-            extra = {'team': team, 'channel': channel, 'user': user}
-            logger = logging.LoggerAdapter(self.logger, extra)
-
-            logger.info(f"Received command /rollcall: {message}")
+            self.dispatcher.submit(PRIORITY_COMMAND, self.tracer.handoff(handler), body,
+                                   on_shed=lambda: self.send_busy(body['channel_id']))
+        return on_command
+
+    def first_time(self, body) -> bool:
+        with self.tracer.span("dedupe") as span:
+            first = self.deduper.first_time(body, self.name)
+            span.set_attribute("duplicate", not first)
+        return first
+
+    async def send_busy(self, channel: str):
+        if not self._busy_replied.add(channel):
+            return
+        await self.send_message(channel, "I'm swamped right now, try again in a bit!")
+
+    async def handle_message(self, body):
+        message = body['event']['text']
+        channel = body['event']['channel']
+        user = body['event']['user']
+        team = body['team_id']
+
+        bind_log_context(team=team, channel=channel, user=user)
+
+        self.logger.debug(f"Received message: {message}")
+
+        if await self.run_command(message, channel, user):
+            return
+        if self._options.get("can_reply_to_all_messages", False):
+            await self.send_message(channel, f"What's up? (from <@{user}>)")
+
+    async def handle_event(self, body):
+        message = body['event']['text']
+        channel = body['event']['channel']
+        user = body['event']['user']
+        team = body['team_id']
+
+        bind_log_context(team=team, channel=channel, user=user)
+
+        self.logger.info(f"Received app_mention: {message}")
+
+        if await self.run_command(message, channel, user):
+            return
+        await self.reply_with_llm(message, channel)
+
+    async def run_command(self, message: str, channel: str, user: str) -> bool:
+        """Run the text command `message` starts with, if any; returns whether one ran."""
+        with self.tracer.span("route") as span:
+            command = self.router.route(message)
+            span.set_attribute("command", command.name if command else "")
+        if command is None:
+            return False
+        handler = getattr(self, f"command_{command.name}", None)
+        if handler is None:
+            self.logger.warning(f"No handler for command {command.name}")
+            return False
+        await handler(channel, user, command.args)
+        return True
 
-            await self.send_message(body['channel_id'], f"I'm here! (from <@{body['user_id']}>)")
-            await self.send_message(body['channel_id'], f"@channel, rollcall! (from <@{body['user_id']}>)")
+    async def command_rollcall(self, channel: str, user: str, args: str):
+        await self.send_message(channel, f"I'm here! (from <@{user}>)")
+
+    async def command_reset(self, channel: str, user: str, args: str):
+        self.reset_state(channel)
+        await self.send_message(channel, f"State reset! (from <@{user}>)")
+
+    async def toggle_mute(self, body):
+        self.muted = not self.muted
+        status = "muted" if self.muted else "unmuted"
+        await self.send_message(body['channel_id'], f"I'm now {status} ! (from <@{body['user_id']}>)")
+
+    async def check_status(self, body):
+        status = "muted" if self.muted else "unmuted"
+        lines = [f"I'm {status} ! (from <@{body['user_id']}>)", *self.status_report()]
+        await self.send_message(body['channel_id'], "\n".join(lines))
+
+    def status_report(self) -> list:
+        jobs = self.dispatcher.stats
+        sent = self.sender.stats
+        llm = self.metrics.llm_summary()
+        lines = [
+            f"queues: {len(self.dispatcher)}/{self.dispatcher.max_queue} events, {len(self.sender)} outbound",
+            f"handled: {jobs['completed']} ok, {jobs['failed']} failed, {jobs['shed']} shed",
+            f"slack api: {sent['sent']} sent, {self.metrics.slack_errors()} errors, {sent['throttled']} throttled",
+            f"llm: {llm['count']} calls, avg {llm['avg']:.2f}s, p99 under {llm['p99']:g}s, "
+            f"circuit {self.llm.breaker.state}",
+        ]
+        if self.sender.spool is not None:
+            lines[0] += f", {len(self.sender.spool.pending)} spooled"
+        if len(self.handler) > 1 or self.handler.stats["refreshes"]:
+            lines.append(f"socket mode: {len(self.handler)} connections, {self.handler.stats['refreshes']} refreshed, "
+                         f"{self.handler.stats['duplicates']} duplicate envelopes")
+        if self.directory is not None:
+            lines.append(f"directory: {len(self.directory.channels)} channels, {len(self.directory.users)} users, "
+                         f"{self.directory.stats['hits']} hits, {self.directory.stats['misses']} misses")
+        lag = loop_lag()
+        if lag is not None:
+            lines.append(f"event loop lag: {lag * 1000:.0f}ms")
+        return lines
+
+    async def call_ping(self, body):
+        await self.send_message(body['channel_id'], f"Pong! (from <@{body['user_id']}>)")
+
+    async def call_rollcall(self, body):
+        bind_log_context(team=body['team_id'], channel=body['channel_id'], user=body['user_id'])
+
+        self.logger.info(f"Received command /rollcall: {body.get('text', '')}")
+
+        text = f"I'm here! (from <@{body['user_id']}>)"
+        if self.rollcall_relay is not None:
+            self.rollcall_relay(body['channel_id'], text)
+        # muted peers stay quiet; this bot answers its own command either way
+        peers = [bot for bot in self.peers if bot is self or not bot.muted]
+        result = await broadcast(peers, text, [body['channel_id']])
+        self.logger.info(f"Rollcall: {result}")
+        await self.send_message(body['channel_id'], f"@channel, rollcall! (from <@{body['user_id']}>)")
 
     def reset_state(self, channel: str):
-        self.state[channel] = {"session_id": str(uuid.uuid4()), "context": []}
+        self.sessions.reset(channel)
 
     async def call_llm_app(self, message: str, channel: str):
-        if channel not in self.state:
-            self.reset_state(channel)
-        req_body = {
-            "message": message,
-            "session_id": self.state[channel]["session_id"],
-        }
-
-        connector = aiohttp.TCPConnector(ssl=False)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.post(self.llm_app_url + '/chat', json=req_body) as response:
-                if response.status == 200:
-                    if response.content_type == 'application/json':
-                        result = await response.json()
-                        return result
-                    else:
-                        return await response.text()
-                else:
-                    response.raise_for_status()
-
-    async def send_message(self, channel: str, message: str):
-        extra = {'team': "", 'channel': channel, 'user': self.name}
-        self.logger = logging.LoggerAdapter(self.logger, extra)
+        with self.tracer.span("llm chat"), self.metrics.llm_timer("chat"):
+            return await self.llm.chat(message, self.sessions.get(channel)["session_id"])
+
+    async def reply_with_llm(self, message: str, channel: str):
+        if self._options.get("llm_streaming", False):
+            self.logger.info("streaming from LLM app")
+            reply = StreamingReply(self.sender, channel, min_interval=self._options.get("llm_update_interval", 1.5))
+            with self.tracer.span("llm stream"), self.metrics.llm_timer("stream"):
+                await reply.render(self.stream_llm_app(message, channel))
+            self.logger.info("Finished streaming response from LLM app")
+            return
         try:
-            if type(message) is not str:
-                message = str(message)
-            self.logger.info(f" > {channel}: {message}")
-            self.client.chat_postMessage(
-                channel=channel,
-                text=message
-            )
+            self.logger.info("calling LLM app")
+            llm_res = await self.call_llm_app(message, channel)
+            self.logger.info(f"Got response back from LLM app")
+            message = llm_res["response"]["content"]
+            await self.send_message(channel, message)
+        except Exception as e:
+            await self.send_message(channel, "error calling LLM app: " + str(e))
 
-        except SlackApiError as e:
-            assert e.response["error"]
+    def stream_llm_app(self, message: str, channel: str):
+        return self.llm.stream_chat(message, self.sessions.get(channel)["session_id"])
 
-        except Exception as e:
-            print(e)
+    async def send_message(self, channel: str, message: str):
+        """Queue a message for delivery and return a future for its DeliveryResult."""
+        if type(message) is not str:
+            message = str(message)
+        self.logger.info(f" > {channel}: {message}", extra={'channel': channel, 'user': self.name})
+        if self.directory is not None:
+            # one ID per channel, so "#name" and "C…" share ordering and rate limits
+            channel = self.directory.resolve_channel(channel)
+        return await self.sender.post_message(channel, message)
+
+    async def broadcast(self, channels, message) -> BroadcastResult:
+        """Post `message` to every channel in `channels` at once."""
+        return await broadcast([self], message, channels)
+
+    async def announce_online(self):
+        """Post online_message to online_channels (default: the default channel)."""
+        self.logger.info(self._options["online_message"])
+        if self.directory is not None:
+            # so online_channels given by name are resolved to IDs
+            timeout = self._options.get("directory_wait", 10)
+            if not await self.directory.wait_loaded(timeout):
+                self.logger.warning(f"Directory not loaded after {timeout}s, announcing with channel names")
+        result = await self.broadcast(self._options.get("online_channels"), self._options["online_message"])
+        if not result.ok:
+            self.logger.warning(f"Online message not delivered to {', '.join(c for _, c in result.failed)}")
 
-    async def send_startup_message(self, channel: str):
-        await self.send_message(channel, self._options["online_message"])
-        
 
     async def start_async(self):
-        self.logger.info(self._options["online_message"])
-        await self.send_startup_message(self._options["default_channel"])
-        await self.handler.start_async()
\ No newline at end of file
+        await self.open()
+        if self._options.get("online_message"):
+            await self.announce_online()
+        try:
+            await self.handler.start_async()
+        finally:
+            await self.close()
+
+    async def open(self):
+        self.tracer.start()
+        await self.sessions.start()
+        await self.sender.replay_spool()
+        if self._options.get("metrics_port"):
+            try:
+                self.metrics_server = await acquire_metrics_server(
+                    self._options.get("metrics_host", "127.0.0.1"), self._options["metrics_port"], logger=self.logger)
+            except OSError as e:
+                self.logger.warning(f"Can't serve metrics on port {self._options['metrics_port']}: {e}")
+        try:
+            identity = await self.client.auth_test()
+            self.event_filter.set_identity(identity.get("user_id"), identity.get("bot_id"))
+            if self.directory is not None:
+                self.directory.self_id = identity.get("user_id")
+        except Exception as e:
+            self.logger.warning(f"auth.test failed, can't recognise own messages: {e}")
+        if self.directory is not None:
+            self.directory.start()
+
+    async def close(self):
+        await self.handler.close_async()
+        await self.dispatcher.close(timeout=self._options.get("dispatch_drain_timeout", 10))
+        await self.sender.close()
+        await self.llm.close()
+        await self.sessions.close()
+        if self.directory is not None:
+            await self.directory.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        await self.tracer.close()
+        if self.metrics_server is not None:
+            await release_metrics_server(self.metrics_server)
+            self.metrics_server = None
+        self.metrics.close()
+        if self._owns_resources:
+            await self.resources.close()
\ No newline at end of file
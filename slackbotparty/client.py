@@ -1,46 +1,96 @@
-import os, json
-import asyncio
-import signal
-from slack_sdk.errors import SlackApiError
+"""Post messages as one of the bots without starting it.
 
+    python client.py "Deploy finished :tada:"
+    python client.py --bot Louie --channel "#alerts" "Disk almost full"
+    some_job | python client.py -                   # one message per stdin line
+    python client.py --jsonl messages.jsonl         # {"channel": ..., "text": ..., "thread_ts": ...} per line
+
+Only the Web API client and the outbound sender are loaded: no Bolt app,
+no Socket Mode connection, no log files. Messages share one HTTP session
+and go out concurrently, paced by the same rate limiter the bots use.
+"""
+import argparse
+import json
+import sys
+import time
+
+START = time.perf_counter()
 
-from bot import AsyncSlackBot
 
 def load_json(filename):
     return json.load(open(filename))
 
 def load_secrets():
-    # import dotenv
-    # dotenv.load_dotenv()
-
-    secrets = load_json("secrets.json")
-    return secrets
+    return load_json("secrets.json")
 
 def load_options():
-    options = load_json("bot_definitions/all.json")
-    return options
+    return load_json("bot_definitions/all.json")
 
-async def main(message):
+def read_messages(args, channel: str) -> list:
+    """[(channel, kwargs)] from the command line, stdin lines or a JSONL file."""
+    if args.jsonl:
+        lines = sys.stdin if args.jsonl == "-" else open(args.jsonl, encoding="utf-8")
+        messages = []
+        for line in lines:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "message" in item:
+                item["text"] = item.pop("message")
+            messages.append((item.pop("channel", channel), item))
+        return messages
+    if args.message == "-":
+        return [(channel, {"text": line.rstrip("\n")}) for line in sys.stdin if line.strip()]
+    return [(channel, {"text": args.message})]
 
-    secrets = load_secrets()
-    options = load_options()
+async def send(token: str, messages: list, api_url: str = None, workers: int = 8, timing: bool = False) -> int:
+    """Post `messages`; returns how many failed."""
+    # the Slack SDK and aiohttp are most of the start-up time, so they're
+    # only imported once there is something to send
+    import asyncio
+    import aiohttp
+    from slack_sdk.web.async_client import AsyncWebClient
+    from bot_utils.sender import AsyncMessageSender
 
-    louie = AsyncSlackBot(options.get('Louie'), secrets.get('Louie'))
-    
-    try:
-        await louie.send_message(
-            channel="#bots-dev",
-            message=message
-        )
-    except SlackApiError as e:
-        print(f"Slack Error: {e}")
-        assert e.response["error"]
-
-    except Exception as e:
-        print(f"Error: {e}")
+    imported = time.perf_counter()
+    failed = 0
+    async with aiohttp.ClientSession() as session:
+        client = AsyncWebClient(token=token, base_url=api_url or AsyncWebClient.BASE_URL, session=session)
+        sender = AsyncMessageSender(client, workers=workers, queue_size=max(1, len(messages)))
+        try:
+            deliveries = [await sender.submit("chat.postMessage", channel=channel, **kwargs)
+                          for channel, kwargs in messages]
+            first = None
+            for delivery in asyncio.as_completed(deliveries):
+                result = await delivery
+                first = first or time.perf_counter()
+                # the sender has already logged the error
+                failed += not result.ok
+        finally:
+            await sender.close()
+    if timing:
+        done = time.perf_counter()
+        print(f"imports {(imported - START) * 1000:.0f}ms, first reply {((first or done) - START) * 1000:.0f}ms, "
+              f"{len(messages)} sent in {(done - imported) * 1000:.0f}ms", file=sys.stderr)
+    return failed
 
 
 if __name__ == '__main__':
-    import sys
-    message = sys.argv[1] if len(sys.argv) > 1 else "Hello world! :tada:"
-    asyncio.run(main(message))
+    parser = argparse.ArgumentParser(description="Post messages to Slack as one of the bots")
+    parser.add_argument("message", nargs="?", default="Hello world! :tada:", help='message text, or "-" for one per stdin line')
+    parser.add_argument("--jsonl", help='file of JSON messages, one per line ("-" for stdin)')
+    parser.add_argument("--bot", default="Louie", help="whose token to post with")
+    parser.add_argument("--channel", help="default channel (default: the bot's default_channel)")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent senders (different channels only)")
+    parser.add_argument("--api-url", help="Slack Web API base URL, e.g. a local stub")
+    parser.add_argument("--timing", action="store_true", help="print start-up and send times to stderr")
+    args = parser.parse_args()
+
+    token = load_secrets()[args.bot]["SLACK_BOT_TOKEN"]
+    channel = args.channel or "#" + load_options()[args.bot]["default_channel"].lstrip("#")
+    messages = read_messages(args, channel)
+    if not messages:
+        sys.exit(0)
+
+    import asyncio
+    sys.exit(1 if asyncio.run(send(token, messages, args.api_url, args.workers, args.timing)) else 0)
@@ -1,9 +1,12 @@
+import argparse
 import json
 import asyncio
 import signal
 
 from bots.asyncslackbot import AsyncSlackBot
 from bots.asyncwebhookconsumerbot import AsyncWebhookConsumerBot
+from bot_utils.diagnostics import LoopDiagnostics
+from bot_utils.resources import ResourceHub
 
 def load_json(filename):
     return json.load(open(filename))
@@ -19,39 +22,79 @@ def load_options():
     options = load_json("bot_definitions/all.json")
     return options
 
+def build_bot(options, secrets, resources=None):
+    extras = options.get('extras', {})
+    if 'webhookUrl' in extras or 'webhookMode' in extras:
+        return AsyncWebhookConsumerBot(options, secrets, resources)
+    return AsyncSlackBot(options, secrets, resources)
+
+async def run_bot(bot):
+    try:
+        await bot.start_async()
+    except Exception as e:
+        # logged and dropped, so the other bots in the process keep running
+        bot.logger.exception(f"{bot.name} stopped: {e!r}")
+        if bot in bot.peers:
+            bot.peers.remove(bot)
+
+async def run_bots(bots):
+    for bot in bots:
+        bot.peers = bots
+    async with asyncio.TaskGroup() as tg:
+        for bot in bots:
+            tg.create_task(run_bot(bot))
+
 async def main():
 
     secrets = load_secrets()
     options = load_options()
+    resources = ResourceHub()
 
-    dexter = AsyncSlackBot(options.get('Dexter'), secrets.get('Dexter'))
-    poppy = AsyncSlackBot(options.get('Poppy'), secrets.get('Poppy'))
+    dexter = AsyncSlackBot(options.get('Dexter'), secrets.get('Dexter'), resources)
+    poppy = AsyncSlackBot(options.get('Poppy'), secrets.get('Poppy'), resources)
 
-    louie = AsyncWebhookConsumerBot(options.get('Louie'), secrets.get('Louie'))
+    louie = AsyncWebhookConsumerBot(options.get('Louie'), secrets.get('Louie'), resources)
 
     dexter.mute()
     poppy.mute()
 
-    async with asyncio.TaskGroup() as tg:
-        tg.create_task(dexter.start_async())
-        tg.create_task(poppy.start_async())
-        tg.create_task(louie.start_async())
+    try:
+        await run_bots([dexter, poppy, louie])
+    finally:
+        await resources.close()
 
 
 # Graceful shutdown
-def shutdown():
-    for task in asyncio.all_tasks():
-        task.cancel()
+def shutdown(loop, task):
+    # cancel only the bots, once, so their close() can still drain the
+    # dispatcher and the sender queues; a second signal must not interrupt that
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: None)
+    task.cancel()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the bots")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="log event loop stalls and write stack profiles to logs/")
+    parser.add_argument("--stall-threshold", type=float, default=0.25, help="seconds before a callback counts as a stall")
+    parser.add_argument("--profile-interval", type=float, default=60, help="seconds between profile files")
+    args = parser.parse_args()
+
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    task = loop.create_task(main())
     for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, shutdown)
+        loop.add_signal_handler(sig, shutdown, loop, task)
 
+    diagnostics = None
+    if args.diagnostics:
+        diagnostics = LoopDiagnostics(loop, threshold=args.stall_threshold, profile_interval=args.profile_interval)
+        diagnostics.start()
     try:
-        loop.run_until_complete(main())
+        loop.run_until_complete(task)
     except asyncio.CancelledError:
         pass
     finally:
+        if diagnostics is not None:
+            diagnostics.stop()
         loop.close()
\ No newline at end of file
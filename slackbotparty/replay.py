@@ -0,0 +1,193 @@
+"""Replays recorded Socket Mode traffic into a bot running against local stubs.
+
+Record real traffic by setting "record_events" on a bot in
+bot_definitions/all.json (e.g. "recordings/{name}.jsonl", plus
+"record_redact_text": true to blank out message text), then:
+
+    python slackbotparty/replay.py recordings/Dexter.jsonl --bot Dexter --speed 10
+
+Envelopes are sent with their recorded spacing divided by --speed, or
+back to back with --speed max. The bot runs with its options from
+all.json, overridden with --set (e.g. --set dispatch_workers=8), so
+worker pool and queue sizes can be tried against a real burst. The report
+shows ack latency, how deep the dispatcher and outbound queues got, how
+many jobs were shed and how long the bot took to drain after the last
+event.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from bench import percentile
+from bot_utils.log import configure_logging
+from bot_utils.recorder import read_recording
+from bot_utils.resources import ResourceHub
+from main import load_options, build_bot
+from stubs.local import LocalStubs
+
+
+def parse_overrides(pairs) -> dict:
+    overrides = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+def speed(value: str):
+    if value == "max":
+        return value
+    try:
+        multiplier = float(value)
+    except ValueError:
+        multiplier = 0
+    if multiplier <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive number or 'max', got {value!r}")
+    return multiplier
+
+
+class Replay():
+    def __init__(self, args):
+        self.args = args
+        self.stubs = LocalStubs(args.slack_delay, args.llm_delay, args.llm_first_token_delay, on_call=self.on_call)
+        self.posts = 0
+        self.ack_latencies = []
+        self.acks = []
+        self.peak_dispatch = 0
+        self.peak_outbound = 0
+
+    def on_call(self, method: str, params: dict):
+        if method in ("chat.postMessage", "chat.update"):
+            self.posts += 1
+
+    def drained(self) -> bool:
+        stats = self.bot.dispatcher.stats
+        done = stats["completed"] + stats["failed"] + stats["shed"]
+        return done >= stats["submitted"] and not len(self.bot.dispatcher) and not len(self.bot.sender)
+
+    async def sample(self):
+        while True:
+            self.peak_dispatch = max(self.peak_dispatch, len(self.bot.dispatcher))
+            self.peak_outbound = max(self.peak_outbound, len(self.bot.sender))
+            await asyncio.sleep(0.01)
+
+    async def send(self, envelope: dict):
+        sent = time.monotonic()
+        ack = await self.stubs.slack.send_envelope(self.app_token, envelope)
+        ack.add_done_callback(lambda f: self.ack_latencies.append(f.result() - sent))
+        self.acks.append(ack)
+
+    async def settle(self):
+        deadline = time.monotonic() + self.args.settle
+        await asyncio.wait(self.acks, timeout=self.args.settle)
+        # listeners run after the ack, so wait for the queues to stay empty
+        # for a few polls rather than trusting the first empty look
+        quiet = 0
+        while quiet < 3 and time.monotonic() < deadline:
+            quiet = quiet + 1 if self.drained() else 0
+            await asyncio.sleep(0.05)
+
+    async def run(self) -> dict:
+        recording = list(read_recording(self.args.recording))
+        if not recording:
+            raise SystemExit(f"{self.args.recording} has no envelopes")
+        await self.stubs.start()
+        options = {**load_options()[self.args.bot], **parse_overrides(self.args.set)}
+        secrets = self.stubs.bot_secrets(self.args.bot)
+        self.app_token = secrets["SLACK_APP_TOKEN"]
+        self.resources = ResourceHub()
+        self.bot = build_bot(self.stubs.bot_options(options), secrets, self.resources)
+        if hasattr(self.bot, "webhook_queue"):
+            raise SystemExit(f"{self.args.bot} doesn't use Socket Mode, there's nothing to replay into")
+        task = asyncio.create_task(self.bot.start_async())
+        sampler = asyncio.create_task(self.sample())
+        try:
+            await asyncio.wait_for(self.stubs.slack.wait_connected(self.app_token), 10)
+            started = time.monotonic()
+            elapsed = 0.0
+            previous = recording[0][0]
+            for recorded_at, envelope in recording:
+                if self.args.speed != "max":
+                    gap = recorded_at - previous
+                    if self.args.max_gap is not None:
+                        gap = min(gap, self.args.max_gap)
+                    elapsed += gap / self.args.speed
+                    delay = started + elapsed - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                previous = recorded_at
+                await self.send(envelope)
+            sent_for = time.monotonic() - started
+
+            finished = time.monotonic()
+            await self.settle()
+            drain = time.monotonic() - finished
+            drained = self.drained()
+        finally:
+            sampler.cancel()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self.resources.close()
+            await self.stubs.close()
+
+        return {
+            "bot": self.args.bot,
+            "speed": self.args.speed,
+            "envelopes": len(recording),
+            "recorded_seconds": round(recording[-1][0] - recording[0][0], 1),
+            "replay_seconds": round(sent_for, 1),
+            "drain_seconds": round(drain, 2),
+            "drained": drained,
+            "ack_ms": {"p50": round(percentile(self.ack_latencies, 50) * 1000, 1),
+                       "p99": round(percentile(self.ack_latencies, 99) * 1000, 1)},
+            "posts": self.posts,
+            "peak_dispatch_queue": self.peak_dispatch,
+            "peak_outbound_queue": self.peak_outbound,
+            "dispatcher": dict(self.bot.dispatcher.stats),
+            "sender": dict(self.bot.sender.stats),
+        }
+
+
+def print_report(result: dict):
+    print(f"bot:             {result['bot']} at {result['speed']:g}x" if result["speed"] != "max"
+          else f"bot:             {result['bot']} at max speed")
+    print(f"envelopes:       {result['envelopes']} ({result['recorded_seconds']}s recorded, "
+          f"replayed in {result['replay_seconds']}s)")
+    print(f"socket ack:      p50 {result['ack_ms']['p50']}ms  p99 {result['ack_ms']['p99']}ms")
+    print(f"drain:           {result['drain_seconds']}s after the last event"
+          + ("" if result["drained"] else " (gave up, still busy)"))
+    print(f"peak queues:     dispatch {result['peak_dispatch_queue']}, outbound {result['peak_outbound_queue']}")
+    dispatcher = result["dispatcher"]
+    print(f"dispatcher:      {dispatcher['submitted']} submitted, {dispatcher['completed']} completed, "
+          f"{dispatcher['failed']} failed, {dispatcher['shed']} shed")
+    sender = result["sender"]
+    print(f"posts:           {result['posts']} ({sender['throttled']} throttled, {sender['dropped']} dropped)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recorded Socket Mode traffic into a bot against local stubs")
+    parser.add_argument("recording", help="JSONL file written by a bot with record_events set")
+    parser.add_argument("--bot", required=True, help="bot name from all.json to replay into")
+    parser.add_argument("--speed", type=speed, default=1.0, help="replay speed multiplier, or 'max'")
+    parser.add_argument("--max-gap", type=float, help="cap recorded idle gaps at this many seconds")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="override a bot option (JSON value)")
+    parser.add_argument("--settle", type=float, default=30, help="seconds to wait for the bot to drain")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="stub chat API delay per streamed word")
+    parser.add_argument("--llm-first-token-delay", type=float, default=0.2)
+    parser.add_argument("--slack-delay", type=float, default=0.05, help="stub Slack API delay per call")
+    parser.add_argument("--log-dir", default="logs/replay")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    configure_logging(log_dir=args.log_dir, level=getattr(logging, args.log_level.upper()))
+    result = asyncio.run(Replay(args).run())
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
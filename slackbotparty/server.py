@@ -6,9 +6,10 @@ from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from slack_bolt.app.async_app import AsyncApp
 from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
-import aiohttp
 import uuid
 
+from bot_utils.llm import LLMClient
+
 dotenv.load_dotenv()
 
 logging.basicConfig(level=logging.WARN)  
@@ -21,6 +22,8 @@ app = AsyncApp(token=os.environ["SLACK_BOT_TOKEN"])
 slack_token = os.environ["SLACK_BOT_TOKEN"]
 client = WebClient(token=slack_token)
 llm_app_url = 'https://chatapi.apps.shaut.us'
+# created in main(), so its session belongs to the running loop and is closed on exit
+llm = None
 
 state = {}
     
@@ -32,22 +35,7 @@ def reset_state(channel: str):
 async def call_llm_app(message: str, channel: str):
     if channel not in state:
         reset_state(channel)
-    req_body = {
-        "message": message,
-        "session_id": state[channel]["session_id"],
-    }
-
-    connector=aiohttp.TCPConnector(ssl=False)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with session.post(llm_app_url + '/chat', json=req_body) as response:
-            if response.status == 200:
-                if response.content_type == 'application/json':
-                    result = await response.json()
-                    return result
-                else:
-                    return await response.text()
-            else:
-                response.raise_for_status()
+    return await llm.chat(message, state[channel]["session_id"])
 
 async def send_message(channel: str, message: str):
     try:
@@ -115,8 +103,13 @@ async def main():
 
 
 async def main():
+    global llm
+    llm = LLMClient(llm_app_url)
     handler = AsyncSocketModeHandler(app, os.environ["SLACK_APP_TOKEN"])
-    await handler.start_async()
+    try:
+        await handler.start_async()
+    finally:
+        await llm.close()
 
 
 if __name__ == "__main__":
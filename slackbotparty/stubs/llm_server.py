@@ -0,0 +1,51 @@
+"""Local stand-in for the chat API (`llm_app_url`), for offline testing.
+
+POST /chat with {"message", "session_id"} returns the same JSON shape as the
+real API. With "stream": true the reply is sent as server-sent events, one
+word per event (`data: {"content": "..."}`), ending with `data: [DONE]`.
+
+    python slackbotparty/stubs/llm_server.py --port 8900 --delay 0.05
+
+then point a bot at it with "llm_app_url": "http://127.0.0.1:8900".
+"""
+import argparse
+import asyncio
+import json
+from aiohttp import web
+
+
+def make_reply(message: str, session_id: str) -> str:
+    return f"You said: {message} (session {session_id}). " + "Here is a long and thoughtful answer. " * 5
+
+
+def create_app(delay: float = 0.05, first_token_delay: float = 0.2) -> web.Application:
+    async def chat(request):
+        body = await request.json()
+        reply = make_reply(body.get("message", ""), body.get("session_id", ""))
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay + delay * len(reply.split()))
+            return web.json_response({"response": {"role": "assistant", "content": reply}})
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        await asyncio.sleep(first_token_delay)
+        for word in reply.split(" "):
+            await response.write(f"data: {json.dumps({'content': word + ' '})}\n\n".encode())
+            await asyncio.sleep(delay)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post('/chat', chat)
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stub chat API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds between streamed words")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    args = parser.parse_args()
+    web.run_app(create_app(args.delay, args.first_token_delay), host=args.host, port=args.port)
@@ -0,0 +1,54 @@
+from aiohttp import web
+
+from stubs.llm_server import create_app as create_llm_app
+from stubs.slack import FakeSlack
+from stubs.webhook_relay import WebhookRelay
+
+
+async def serve(app: web.Application):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+class LocalStubs():
+    """Fake Slack, chat API and webhook relay served on free local ports, for bench.py and replay.py."""
+
+    def __init__(self, slack_delay: float = 0.0, llm_delay: float = 0.0, llm_first_token_delay: float = 0.05,
+                 on_call=None):
+        self.slack = FakeSlack(api_delay=slack_delay, on_call=on_call)
+        self.relay = WebhookRelay()
+        self.llm_app = create_llm_app(llm_delay, llm_first_token_delay)
+        self.slack_url = self.llm_url = self.relay_url = None
+        self._runners = []
+
+    async def start(self):
+        urls = []
+        for app in (self.slack.app, self.llm_app, self.relay.app):
+            runner, url = await serve(app)
+            self._runners.append(runner)
+            urls.append(url)
+        self.slack_url, self.llm_url, self.relay_url = urls
+
+    def bot_options(self, options: dict) -> dict:
+        """A bot's options with every external URL pointed at the stubs."""
+        options = {**options, "slack_api_url": f"{self.slack_url}/api/", "llm_app_url": self.llm_url}
+        extras = dict(options.get("extras", {}))
+        if "webhookUrl" in extras or "webhookMode" in extras:
+            extras.update(webhookUrl=f"{self.relay_url}/events", webhookMode="poll", webhookLongPollSeconds=5)
+            # digests fold events together, which would hide their latency
+            extras.pop("digest", None)
+        options["extras"] = extras
+        return options
+
+    @staticmethod
+    def bot_secrets(name: str) -> dict:
+        return {"SLACK_BOT_TOKEN": f"xoxb-bench-{name}", "SLACK_APP_TOKEN": f"xapp-bench-{name}"}
+
+    async def close(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners = []
@@ -0,0 +1,174 @@
+"""Local stand-in for the Slack Web API and Socket Mode, for offline testing.
+
+POST /api/<method> answers the Web API calls the bots make (auth.test,
+apps.connections.open, chat.postMessage, chat.update, conversations.list,
+users.list). apps.connections.open hands out a websocket URL on this same
+server; events pushed with `FakeSlack.send_event` are delivered over it as
+Socket Mode envelopes and the bot's acks are recorded.
+
+    python slackbotparty/stubs/slack.py --port 8901
+
+then point a bot at it with "slack_api_url": "http://127.0.0.1:8901/api/".
+When run standalone, POST /push/<app token> with an event object delivers
+it to that app's socket.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+import uuid
+from aiohttp import web, WSMsgType
+
+TEAM_ID = "TBENCH"
+
+
+class FakeSlack():
+    """Fake workspace. `on_call(method, params)` is called for every Web API request.
+
+    `channels` and `users` are what conversations.list and users.list page through.
+    """
+
+    def __init__(self, api_delay: float = 0.0, on_call=None, channels=(), users=()):
+        self.api_delay = api_delay
+        self.on_call = on_call
+        self.channels = list(channels)
+        self.users = list(users)
+        self.identities = {}
+        self.sockets = {}
+        self.acks = {}
+        self.stats = {"calls": 0, "events": 0, "acks": 0}
+        self._ts = itertools.count(1)
+        self._next_socket = {}
+        self._connected = {}
+        self.app = web.Application()
+        self.app.router.add_post('/api/{method}', self.api)
+        self.app.router.add_get('/socket', self.socket)
+        self.app.router.add_post('/push/{app_token}', self.push)
+
+    def identity(self, token: str) -> dict:
+        if token not in self.identities:
+            n = len(self.identities) + 1
+            self.identities[token] = {"user_id": f"UBOT{n:04d}", "bot_id": f"BBOT{n:04d}", "app_id": f"ABOT{n:04d}"}
+        return self.identities[token]
+
+    async def api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        params.update(request.query)
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ") or params.get("token", "")
+        self.stats["calls"] += 1
+        if self.on_call is not None:
+            self.on_call(method, params)
+        if self.api_delay:
+            await asyncio.sleep(self.api_delay)
+
+        if method == "auth.test":
+            me = self.identity(token)
+            return web.json_response({"ok": True, "team_id": TEAM_ID, "team": "bench", "user": "bot",
+                                      "user_id": me["user_id"], "bot_id": me["bot_id"]})
+        if method == "apps.connections.open":
+            url = f"ws://{request.host}/socket?token={token}"
+            return web.json_response({"ok": True, "url": url})
+        if method in ("chat.postMessage", "chat.update"):
+            ts = params.get("ts") or f"{int(time.time())}.{next(self._ts):06d}"
+            return web.json_response({"ok": True, "channel": params.get("channel"), "ts": ts,
+                                      "message": {"text": params.get("text"), "ts": ts}})
+        if method == "conversations.list":
+            return web.json_response({"ok": True, **self._page("channels", self.channels, params)})
+        if method == "users.list":
+            return web.json_response({"ok": True, **self._page("members", self.users, params)})
+        return web.json_response({"ok": False, "error": "unknown_method"})
+
+    @staticmethod
+    def _page(key: str, items: list, params: dict) -> dict:
+        start = int(params.get("cursor") or 0)
+        end = start + int(params.get("limit") or 100)
+        cursor = str(end) if end < len(items) else ""
+        return {key: items[start:end], "response_metadata": {"next_cursor": cursor}}
+
+    async def socket(self, request: web.Request) -> web.WebSocketResponse:
+        token = request.query.get("token", "")
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.setdefault(token, []).append(ws)
+        self._connected_event(token).set()
+        await ws.send_json({"type": "hello", "num_connections": len(self.sockets[token]),
+                            "connection_info": {"app_id": self.identity(token)["app_id"]}})
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                envelope_id = json.loads(msg.data).get("envelope_id")
+                ack = self.acks.get(envelope_id)
+                if ack is not None and not ack.done():
+                    self.stats["acks"] += 1
+                    ack.set_result(time.monotonic())
+        finally:
+            self.sockets[token].remove(ws)
+            if not self.sockets[token]:
+                self._connected_event(token).clear()
+        return ws
+
+    def _connected_event(self, token: str) -> asyncio.Event:
+        if token not in self._connected:
+            self._connected[token] = asyncio.Event()
+        return self._connected[token]
+
+    async def wait_connected(self, app_token: str):
+        await self._connected_event(app_token).wait()
+
+    async def send_event(self, app_token: str, event: dict) -> asyncio.Future:
+        """Deliver an Events API event to the app's socket; returns a future for the ack time."""
+        payload = {
+            "token": "bench",
+            "team_id": TEAM_ID,
+            "api_app_id": self.identity(app_token)["app_id"],
+            "event": event,
+            "type": "event_callback",
+            "event_id": f"Ev{uuid.uuid4().hex[:12].upper()}",
+            "event_time": int(time.time()),
+        }
+        return await self.send_envelope(app_token, {"type": "events_api", "accepts_response_payload": False,
+                                                    "retry_attempt": 0, "retry_reason": "", "payload": payload})
+
+    async def send_envelope(self, app_token: str, envelope: dict) -> asyncio.Future:
+        """Deliver a Socket Mode envelope under a fresh envelope_id; returns a future for the ack time."""
+        sockets = self.sockets.get(app_token)
+        if not sockets:
+            raise RuntimeError(f"no socket connected for {app_token}")
+        # spread envelopes over the app's connections like Slack does
+        i = self._next_socket.get(app_token, 0)
+        self._next_socket[app_token] = i + 1
+        ws = sockets[i % len(sockets)]
+        envelope_id = str(uuid.uuid4())
+        ack = self.acks[envelope_id] = asyncio.get_running_loop().create_future()
+        ack.add_done_callback(lambda _: self.acks.pop(envelope_id, None))
+        self.stats["events"] += 1
+        await ws.send_json({**envelope, "envelope_id": envelope_id})
+        return ack
+
+    async def push(self, request: web.Request) -> web.Response:
+        event = await request.json()
+        try:
+            await self.send_event(request.match_info["app_token"], event)
+        except RuntimeError as e:
+            return web.json_response({"ok": False, "error": str(e)}, status=404)
+        return web.json_response({"ok": True})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stub Slack Web API and Socket Mode server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--api-delay", type=float, default=0.0, help="seconds added to every Web API call")
+    args = parser.parse_args()
+
+    def log_call(method, params):
+        if method.startswith("chat."):
+            print(f"{method} {params.get('channel')}: {params.get('text')}")
+
+    web.run_app(FakeSlack(args.api_delay, on_call=log_call).app, host=args.host, port=args.port)
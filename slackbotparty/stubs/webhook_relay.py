@@ -0,0 +1,52 @@
+"""Local stand-in for the webhook relay (`extras.webhookUrl`), for offline testing.
+
+POST /events with a JSON object or list queues events. GET /events returns
+everything queued as a JSON list, or 204 when there's nothing; with ?wait=N
+it holds the request open up to N seconds for an event to arrive.
+
+    python slackbotparty/stubs/webhook_relay.py --port 8902
+
+then point a webhook bot at it with "webhookUrl": "http://127.0.0.1:8902/events".
+"""
+import argparse
+import asyncio
+from aiohttp import web
+
+
+class WebhookRelay():
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        self.pending = []
+        self._arrived = asyncio.Event()
+        self.app = web.Application()
+        self.app.router.add_get('/events', self.poll)
+        self.app.router.add_post('/events', self.receive)
+
+    def push(self, item):
+        self.pending.extend(item if isinstance(item, list) else [item])
+        self._arrived.set()
+
+    async def receive(self, request: web.Request) -> web.Response:
+        self.push(await request.json())
+        return web.json_response({"ok": True}, status=202)
+
+    async def poll(self, request: web.Request) -> web.Response:
+        wait = float(request.query.get("wait", 0))
+        if not self.pending and wait > 0:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        if not self.pending:
+            return web.Response(status=204)
+        batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+        return web.json_response(batch)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stub webhook relay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8902)
+    args = parser.parse_args()
+    web.run_app(WebhookRelay().app, host=args.host, port=args.port)
@@ -0,0 +1,262 @@
+"""Runs the bot roster across several worker processes.
+
+    python slackbotparty/supervisor.py --workers 4
+
+Every bot defined in bot_definitions/all.json that has tokens in
+secrets.json is assigned to one of N worker processes, each running its
+bots in a single event loop like main.py does. Crashed workers are
+restarted with exponential backoff; SIGTERM/SIGINT are forwarded to the
+workers so they can drain their outbound queues before exiting. A
+/rollcall is passed through the supervisor to every worker, so the whole
+roster answers it, not just the bots sharing a process with the one asked.
+
+    python slackbotparty/supervisor.py --announce "{name} is back after the upgrade"
+
+posts once as every bot in the roster, concurrently, and exits.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot_utils import get_bot_logger
+from bot_utils.broadcast import BroadcastResult, broadcast
+from bot_utils.resources import ResourceHub
+from bot_utils.sender import AsyncMessageSender
+from main import load_options, load_secrets, build_bot, run_bots, shutdown
+
+
+TOKENS = ("SLACK_BOT_TOKEN", "SLACK_APP_TOKEN")
+
+
+def load_roster(options, secrets, only=None):
+    """Names of the bots in `options` (or `only`) that have both Slack tokens in `secrets`."""
+    logger = get_bot_logger("supervisor")
+    roster = []
+    for name, bot_options in options.items():
+        if only and name not in only:
+            continue
+        bot_secrets = secrets.get(name) or {}
+        missing = [token for token in TOKENS if not bot_secrets.get(token)]
+        if missing:
+            logger.warning(f"Skipping {name}: no {' or '.join(missing)} in secrets.json")
+            continue
+        roster.append(name)
+    return roster
+
+
+def shard(names, options, workers: int):
+    """Assign bots to workers round-robin, spreading the chattiest bots out first."""
+    workers = max(1, min(workers, len(names)))
+    chatty = sorted(names, key=lambda n: not options[n].get("watch_all_messages", False))
+    shards = [[] for _ in range(workers)]
+    for i, name in enumerate(chatty):
+        shards[i % workers].append(name)
+    return shards
+
+
+async def answer_rollcalls(bots, commands):
+    """Have `bots` answer the rollcalls the supervisor relays from other workers."""
+    while True:
+        try:
+            # polled, so the thread never outlives the loop by more than a second
+            kind, channel, text = await asyncio.to_thread(commands.get, timeout=1)
+        except queue.Empty:
+            continue
+        if kind == "rollcall":
+            await broadcast([bot for bot in bots if not bot.muted], text, [channel])
+
+
+def worker_main(names, index: int = 0, inbox=None, commands=None):
+    async def run():
+        options = load_options()
+        secrets = load_secrets()
+        resources = ResourceHub()
+        logger = get_bot_logger("supervisor")
+        bots = []
+        for name in names:
+            bot_options = options[name]
+            if bot_options.get("metrics_port"):
+                # one metrics server per worker process
+                bot_options = {**bot_options, "metrics_port": bot_options["metrics_port"] + index}
+            try:
+                bot = build_bot(bot_options, secrets[name], resources)
+            except Exception as e:
+                # one misconfigured bot mustn't keep the rest of the shard down
+                logger.exception(f"Failed to build {name}, skipping it: {e!r}")
+                continue
+            if options[name].get("start_muted", False):
+                bot.mute()
+            if inbox is not None:
+                bot.rollcall_relay = lambda channel, text: inbox.put(("rollcall", index, channel, text))
+            bots.append(bot)
+        listener = asyncio.create_task(answer_rollcalls(bots, commands)) if commands is not None else None
+        try:
+            await run_bots(bots)
+        finally:
+            if listener is not None:
+                listener.cancel()
+            await resources.close()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    task = loop.create_task(run())
+    # Ctrl-C reaches the whole process group, then the supervisor forwards
+    # SIGTERM: shutdown() ignores the second one so the drain can finish
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown, loop, task)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.close()
+
+
+class Announcer():
+    """Just enough of a bot to post as it, without connecting to Socket Mode."""
+
+    def __init__(self, name: str, options, secrets, resources: ResourceHub):
+        self.name = name
+        self.default_channel = options["default_channel"]
+        client = resources.web_client(secrets["SLACK_BOT_TOKEN"],
+                                      base_url=options.get("slack_api_url", AsyncWebClient.BASE_URL))
+        self.sender = AsyncMessageSender(client, workers=options.get("send_workers", 2))
+
+    async def send_message(self, channel: str, message: str):
+        return await self.sender.post_message(channel, message)
+
+
+def announce(names, options, secrets, message: str, channels=None) -> BroadcastResult:
+    """Post `message` ("{name}" is the bot's name) as every bot in `names`."""
+    async def run():
+        resources = ResourceHub()
+        bots = [Announcer(name, options[name], secrets[name], resources) for name in names]
+        try:
+            return await broadcast(bots, lambda bot: message.format(name=bot.name), channels)
+        finally:
+            for bot in bots:
+                await bot.sender.close()
+            await resources.close()
+
+    return asyncio.run(run())
+
+
+class Worker():
+    def __init__(self, index: int, names, commands):
+        self.index = index
+        self.names = names
+        # rollcalls from the other workers' bots
+        self.commands = commands
+        self.process = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at = 0.0
+
+    def start(self, ctx, inbox):
+        self.process = ctx.Process(target=worker_main, args=(self.names, self.index, inbox, self.commands),
+                                   name=f"bots-{self.index}")
+        self.process.start()
+        self.started_at = time.monotonic()
+
+
+class Supervisor():
+    def __init__(self, shards, backoff: float = 1, max_backoff: float = 60, stable_after: float = 60,
+                 drain_timeout: float = 30):
+        self.ctx = multiprocessing.get_context("spawn")
+        # every worker reports its rollcalls here, to be passed on to the others
+        self.inbox = self.ctx.Queue()
+        self.workers = [Worker(i, names, self.ctx.Queue()) for i, names in enumerate(shards)]
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.drain_timeout = drain_timeout
+        self.stopping = False
+        self.logger = get_bot_logger("supervisor")
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+
+    def _check(self, worker: Worker):
+        now = time.monotonic()
+        if worker.process is None:
+            if now >= worker.restart_at:
+                worker.start(self.ctx, self.inbox)
+                self.logger.info(f"Started worker {worker.index} (pid {worker.process.pid}): {', '.join(worker.names)}")
+            return
+        if worker.process.is_alive():
+            return
+        exitcode = worker.process.exitcode
+        worker.process = None
+        if now - worker.started_at >= self.stable_after:
+            worker.failures = 0
+        delay = min(self.max_backoff, self.backoff * 2 ** worker.failures)
+        worker.failures += 1
+        worker.restart_at = now + delay
+        self.logger.error(f"Worker {worker.index} exited with {exitcode}, restarting in {delay:g}s")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopping:
+            for worker in self.workers:
+                self._check(worker)
+            self.relay(timeout=0.5)
+        self.drain()
+
+    def relay(self, timeout: float):
+        """Pass a rollcall from one worker on to every other running worker."""
+        try:
+            kind, index, channel, text = self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return
+        for worker in self.workers:
+            if worker.index != index and worker.process is not None:
+                worker.commands.put((kind, channel, text))
+
+    def drain(self):
+        alive = [w.process for w in self.workers if w.process is not None and w.process.is_alive()]
+        self.logger.info(f"Stopping {len(alive)} workers")
+        for process in alive:
+            os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout
+        for process in alive:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                self.logger.warning(f"Worker {process.name} did not drain in {self.drain_timeout}s, killing it")
+                process.kill()
+                process.join()
+        for worker in self.workers:
+            # relayed rollcalls no worker will read mustn't hold up our exit
+            worker.commands.cancel_join_thread()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the bot roster across worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--bots", help="comma-separated bot names (default: every bot with secrets)")
+    parser.add_argument("--drain-timeout", type=float, default=30)
+    parser.add_argument("--max-backoff", type=float, default=60)
+    parser.add_argument("--announce", metavar="MESSAGE", help="post MESSAGE as every bot and exit")
+    parser.add_argument("--channels", help="comma-separated channels to announce in (default: each bot's own)")
+    args = parser.parse_args()
+
+    options = load_options()
+    secrets = load_secrets()
+    roster = load_roster(options, secrets, args.bots.split(",") if args.bots else None)
+    if not roster:
+        raise SystemExit("No bots with secrets to run")
+    if args.announce:
+        result = announce(roster, options, secrets, args.announce, args.channels.split(",") if args.channels else None)
+        print(result)
+        for (name, channel), delivery in result.failed.items():
+            print(f"  {name} -> {channel}: {delivery.error}")
+        raise SystemExit(0 if result.ok else 1)
+    supervisor = Supervisor(shard(roster, options, args.workers), max_backoff=args.max_backoff,
+                            drain_timeout=args.drain_timeout)
+    supervisor.run()
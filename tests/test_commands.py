@@ -0,0 +1,56 @@
+import pytest
+
+from bot_utils.commands import CommandRouter
+
+
+@pytest.fixture
+def router():
+    return CommandRouter({
+        "rollcall": ["rollcall", "roll call"],
+        "reset": ["reset"],
+        "deploy": ["re:deploy(?:ment)?"],
+        "disabled": None,
+    })
+
+
+@pytest.mark.parametrize("text, name, args", [
+    ("rollcall", "rollcall", ""),
+    ("Rollcall please", "rollcall", "please"),
+    ("roll   call", "rollcall", ""),
+    ("<@U123> reset", "reset", ""),
+    ("<@U123|dexter>, <@U456>: reset now", "reset", "now"),
+    ("  reset!", "reset", "!"),
+    ("deployment status", "deploy", "status"),
+    ("deploy", "deploy", ""),
+])
+def test_routes_keyword_at_start(router, text, name, args):
+    match = router.route(text)
+    assert match is not None
+    assert (match.name, match.args) == (name, args)
+
+
+@pytest.mark.parametrize("text", [
+    "threshold reset",
+    "resetting",
+    "rollcalls",
+    "deployments",
+    "hello <@U123> reset",
+    "",
+    None,
+])
+def test_ignores_keyword_elsewhere_or_inside_a_word(router, text):
+    assert router.route(text) is None
+
+
+def test_disabled_commands_are_dropped(router):
+    assert "disabled" not in router.commands
+
+
+def test_longest_keyword_of_a_command_wins():
+    router = CommandRouter({"rollcall": ["roll", "roll call"]})
+    assert router.route("roll call everyone").args == "everyone"
+    assert router.route("roll everyone").args == "everyone"
+
+
+def test_no_commands():
+    assert CommandRouter({}).route("reset") is None
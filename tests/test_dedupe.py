@@ -0,0 +1,74 @@
+import pytest
+
+from bot_utils import dedupe
+from bot_utils.dedupe import EventDeduper, TTLSet, event_keys
+
+
+class Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedupe, "time", clock)
+    return clock
+
+
+def test_ttlset_forgets_keys_after_ttl(clock):
+    seen = TTLSet(ttl=10)
+    assert seen.add("a")
+    assert not seen.add("a")
+    clock.now += 9
+    assert "a" in seen
+    clock.now += 1
+    assert "a" not in seen
+    assert seen.add("a")
+
+
+def test_ttlset_is_size_capped(clock):
+    seen = TTLSet(ttl=10, max_size=3)
+    for key in "abcde":
+        seen.add(key)
+        clock.now += 0.1
+    assert len(seen) <= 4
+    assert "a" not in seen
+    assert "e" in seen
+
+
+def message(event_id="Ev1", kind="message", client_msg_id="m1", ts="1.0"):
+    return {"event_id": event_id,
+            "event": {"type": kind, "client_msg_id": client_msg_id, "channel": "C1", "ts": ts}}
+
+
+def test_event_keys():
+    assert event_keys(message()) == [("event_id", "Ev1"), ("msg", "message", "m1"), ("ts", "message", "C1", "1.0")]
+    assert event_keys({}) == []
+
+
+def test_deduper_drops_redeliveries(clock):
+    deduper = EventDeduper()
+    assert deduper.first_time(message())
+    assert not deduper.first_time(message())
+    # the same message through another envelope
+    assert not deduper.first_time(message(event_id="Ev2"))
+    # the app_mention for the same message is a different event
+    assert deduper.first_time(message(event_id="Ev3", kind="app_mention"))
+    assert deduper.stats == {"unique": 2, "duplicates": 2}
+
+
+def test_deduper_scopes_keys_by_bot(clock):
+    deduper = EventDeduper()
+    assert deduper.first_time(message(), "Poppy")
+    assert deduper.first_time(message(), "Dexter")
+    assert not deduper.first_time(message(), "Dexter")
+
+
+def test_events_without_keys_always_pass(clock):
+    deduper = EventDeduper()
+    assert deduper.first_time({"event": {"type": "message"}})
+    assert deduper.first_time({"event": {"type": "message"}})
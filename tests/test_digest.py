@@ -0,0 +1,80 @@
+import asyncio
+
+from bot_utils.digest import AlertAggregator, normalize
+
+
+class Posts():
+    def __init__(self):
+        self.posts = []
+
+    async def emit(self, channel, text):
+        self.posts.append((channel, text))
+
+
+def test_normalize_folds_numbers_and_ids():
+    assert normalize("Disk  90% full on host-12") == normalize("disk 95% full on host-7")
+    assert normalize("req deadbeef01 failed") == normalize("req 0123abcd99 failed")
+
+
+async def test_first_alert_posts_then_window_digests_the_rest():
+    posts = Posts()
+    aggregator = AlertAggregator(posts.emit, window=0.1)
+    await aggregator.add("C1", "disk 90% full", {"message": "disk 90% full"})
+    for pct in (91, 92, 93):
+        await aggregator.add("C1", f"disk {pct}% full", {"message": f"disk {pct}% full"})
+    await aggregator.add("C1", "cpu hot", {"message": "cpu hot"})
+    assert posts.posts == [("C1", "disk 90% full")]
+
+    await asyncio.sleep(0.2)
+    assert len(posts.posts) == 2
+    digest = posts.posts[1][1]
+    assert digest.startswith(":rotating_light: 4 alerts in the last 0.1s (2 distinct)")
+    assert "• 3× disk 91% full" in digest
+    assert "• 1× cpu hot" in digest
+    assert aggregator.stats == {"received": 5, "posted": 2, "digests": 1, "collapsed": 2}
+
+
+async def test_windows_are_per_channel():
+    posts = Posts()
+    aggregator = AlertAggregator(posts.emit, window=0.1)
+    await aggregator.add("C1", "a", {"message": "a"})
+    await aggregator.add("C2", "b", {"message": "b"})
+    assert posts.posts == [("C1", "a"), ("C2", "b")]
+    await aggregator.close()
+
+
+async def test_quiet_window_posts_nothing_more():
+    posts = Posts()
+    aggregator = AlertAggregator(posts.emit, window=0.05)
+    await aggregator.add("C1", "a", {"message": "a"})
+    await asyncio.sleep(0.1)
+    assert posts.posts == [("C1", "a")]
+    # the window has closed, so the next alert opens a new one
+    await aggregator.add("C1", "b", {"message": "b"})
+    assert posts.posts[-1] == ("C1", "b")
+    await aggregator.close()
+
+
+async def test_without_leading_edge_everything_waits_for_the_digest():
+    posts = Posts()
+    aggregator = AlertAggregator(posts.emit, window=10, leading_edge=False)
+    await aggregator.add("C1", "a", {"message": "a"})
+    assert posts.posts == []
+    await aggregator.close()
+    assert len(posts.posts) == 1
+    assert "1 alert in the last" in posts.posts[0][1]
+
+
+def test_digest_truncates_to_max_lines():
+    aggregator = AlertAggregator(Posts().emit, window=30, max_lines=2)
+    text = aggregator.render({
+        key: group for key, group in ((k, _group(k, n)) for k, n in (("a", 5), ("b", 3), ("c", 2), ("d", 1)))
+    })
+    assert text.splitlines()[1:] == ["• 5× a", "• 3× b", "…and 3 more across 2 other alerts"]
+
+
+def _group(text, count):
+    from bot_utils.digest import AlertGroup
+    group = AlertGroup(text)
+    group.count = count
+    return group
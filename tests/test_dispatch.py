@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from bot_utils.dispatch import (EventDispatcher, PRIORITY_COMMAND, PRIORITY_MESSAGE, PRIORITY_LLM,
+                                SHED_DROP_NEWEST, SHED_DROP_OLDEST)
+
+
+class Recorder():
+    def __init__(self):
+        self.ran = []
+        self.shed = []
+        self.gate = asyncio.Event()
+
+    async def block(self):
+        await self.gate.wait()
+
+    def job(self, name):
+        async def fn():
+            self.ran.append(name)
+        fn.__name__ = name
+        return fn
+
+    def on_shed(self, name):
+        async def fn():
+            self.shed.append(name)
+        return fn
+
+
+async def full_dispatcher(policy, recorder, max_queue=2):
+    """A dispatcher whose only worker is busy, so submitted jobs stay queued."""
+    dispatcher = EventDispatcher(workers=1, max_queue=max_queue, policy=policy)
+    dispatcher.submit(PRIORITY_COMMAND, recorder.block)
+    await asyncio.sleep(0)
+    return dispatcher
+
+
+async def drain(dispatcher, recorder):
+    recorder.gate.set()
+    await dispatcher.close(timeout=1)
+
+
+async def test_runs_jobs_in_priority_order():
+    recorder = Recorder()
+    dispatcher = await full_dispatcher("busy", recorder, max_queue=10)
+    dispatcher.submit(PRIORITY_LLM, recorder.job("llm"))
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("message"))
+    dispatcher.submit(PRIORITY_COMMAND, recorder.job("command"))
+    await drain(dispatcher, recorder)
+    assert recorder.ran == ["command", "message", "llm"]
+    assert dispatcher.stats["completed"] == 4
+
+
+async def test_evicts_newest_lower_priority_job():
+    recorder = Recorder()
+    dispatcher = await full_dispatcher("busy", recorder)
+    dispatcher.submit(PRIORITY_LLM, recorder.job("llm1"), on_shed=recorder.on_shed("llm1"))
+    dispatcher.submit(PRIORITY_LLM, recorder.job("llm2"), on_shed=recorder.on_shed("llm2"))
+    assert dispatcher.submit(PRIORITY_COMMAND, recorder.job("command"))
+    await drain(dispatcher, recorder)
+    assert recorder.ran == ["command", "llm1"]
+    assert recorder.shed == ["llm2"]
+
+
+async def test_busy_rejects_new_job_and_calls_on_shed():
+    recorder = Recorder()
+    dispatcher = await full_dispatcher("busy", recorder)
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("a"))
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("b"))
+    assert not dispatcher.submit(PRIORITY_MESSAGE, recorder.job("c"), on_shed=recorder.on_shed("c"))
+    await drain(dispatcher, recorder)
+    assert recorder.ran == ["a", "b"]
+    assert recorder.shed == ["c"]
+    assert dispatcher.stats["shed"] == 1
+
+
+async def test_drop_oldest_evicts_oldest_of_same_priority():
+    recorder = Recorder()
+    dispatcher = await full_dispatcher(SHED_DROP_OLDEST, recorder)
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("a"), on_shed=recorder.on_shed("a"))
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("b"))
+    assert dispatcher.submit(PRIORITY_MESSAGE, recorder.job("c"))
+    await drain(dispatcher, recorder)
+    assert recorder.ran == ["b", "c"]
+    # on_shed is only for the "busy" policy
+    assert recorder.shed == []
+
+
+async def test_drop_newest_rejects_new_job():
+    recorder = Recorder()
+    dispatcher = await full_dispatcher(SHED_DROP_NEWEST, recorder)
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("a"))
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("b"))
+    assert not dispatcher.submit(PRIORITY_MESSAGE, recorder.job("c"))
+    await drain(dispatcher, recorder)
+    assert recorder.ran == ["a", "b"]
+
+
+async def test_higher_priority_job_is_never_evicted_for_lower():
+    recorder = Recorder()
+    dispatcher = await full_dispatcher(SHED_DROP_OLDEST, recorder)
+    dispatcher.submit(PRIORITY_COMMAND, recorder.job("a"))
+    dispatcher.submit(PRIORITY_COMMAND, recorder.job("b"))
+    assert not dispatcher.submit(PRIORITY_LLM, recorder.job("c"))
+    await drain(dispatcher, recorder)
+    assert recorder.ran == ["a", "b"]
+
+
+async def test_failing_job_is_counted_and_worker_survives():
+    dispatcher = EventDispatcher(workers=1)
+
+    async def boom():
+        raise RuntimeError("boom")
+
+    recorder = Recorder()
+    dispatcher.submit(PRIORITY_MESSAGE, boom)
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("after"))
+    await dispatcher.close(timeout=1)
+    assert dispatcher.stats["failed"] == 1
+    assert recorder.ran == ["after"]
+
+
+async def test_close_drops_jobs_left_after_timeout():
+    recorder = Recorder()
+    dispatcher = await full_dispatcher("busy", recorder)
+    dispatcher.submit(PRIORITY_MESSAGE, recorder.job("a"))
+    await dispatcher.close(timeout=0.05)
+    assert recorder.ran == []
+    assert len(dispatcher) == 0
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        EventDispatcher(policy="random")
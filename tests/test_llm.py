@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from bot_utils.llm import LLMClient, chunk_text
+from stubs.local import serve
+
+
+@pytest.mark.parametrize("data, text", [
+    ('{"content": "hi"}', "hi"),
+    ('{"delta": "hi"}', "hi"),
+    ('{"text": "hi"}', "hi"),
+    ('{"response": {"content": "hi"}}', "hi"),
+    ('"hi"', "hi"),
+    ("plain text", "plain text"),
+    ('{"other": 1}', ""),
+    ("[1, 2]", ""),
+    ("", ""),
+])
+def test_chunk_text(data, text):
+    assert chunk_text(data) == text
+
+
+def streaming_app(content_type: str, body: list, gap: float = 0):
+    async def chat(request):
+        response = web.StreamResponse(headers={"Content-Type": content_type})
+        await response.prepare(request)
+        for part in body:
+            await asyncio.sleep(gap)
+            await response.write(part.encode())
+        return response
+
+    app = web.Application()
+    app.router.add_post("/chat", chat)
+    return app
+
+
+async def stream(app, timeout: float = 5) -> list:
+    runner, url = await serve(app)
+    client = LLMClient(url, timeout=timeout)
+    try:
+        return [chunk async for chunk in client.stream_chat("hi", "s1")]
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+async def test_server_sent_events():
+    body = ['data: {"delta": "Hel"}\n\n', ": keep-alive\n\n", 'data: {"delta": "lo"}\n\n',
+            "data: [DONE]\n\n", 'data: {"delta": "ignored"}\n\n']
+    assert await stream(streaming_app("text/event-stream", body)) == ["Hel", "lo"]
+
+
+async def test_ndjson():
+    body = [json.dumps({"content": "Hel"}) + "\n", json.dumps({"content": "lo"}) + "\n", "\n"]
+    assert await stream(streaming_app("application/x-ndjson", body)) == ["Hel", "lo"]
+
+
+async def test_plain_chunked_text_keeps_split_characters_whole():
+    snowman = "☃".encode()
+    app = web.Application()
+
+    async def chat(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/plain"})
+        await response.prepare(request)
+        await response.write(b"a" + snowman[:1])
+        await asyncio.sleep(0.01)
+        await response.write(snowman[1:] + b"b")
+        return response
+
+    app.router.add_post("/chat", chat)
+    assert "".join(await stream(app)) == "a☃b"
+
+
+async def test_single_json_body():
+    app = web.Application()
+
+    async def chat(request):
+        return web.json_response({"response": {"content": "whole reply"}})
+
+    app.router.add_post("/chat", chat)
+    assert await stream(app) == ["whole reply"]
+
+
+async def test_timeout_is_per_chunk_for_streams():
+    body = ["w "] * 8
+    chunks = await stream(streaming_app("text/plain", body, gap=0.05), timeout=0.2)
+    assert "".join(chunks) == "w " * 8
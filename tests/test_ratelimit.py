@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from bot_utils import ratelimit
+from bot_utils.ratelimit import RateLimiter, TokenBucket
+
+
+class Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+def test_bucket_allows_burst_then_paces(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    for _ in range(3):
+        assert bucket.delay(clock.now) == 0
+        bucket.consume()
+    assert bucket.delay(clock.now) == pytest.approx(1)
+    clock.now += 0.5
+    assert bucket.delay(clock.now) == pytest.approx(0.5)
+
+
+def test_pause_blocks_for_retry_after(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    bucket.pause(2)
+    assert bucket.delay(clock.now) == pytest.approx(2)
+    clock.now += 2
+    assert bucket.delay(clock.now) == 0
+
+
+def test_short_retry_after_does_not_wait_for_a_refill(clock):
+    bucket = TokenBucket(rate=1 / 3, capacity=2)
+    bucket.consume()
+    bucket.pause(0.1)
+    assert bucket.delay(clock.now) == pytest.approx(0.1)
+
+
+def test_pause_never_shortens_an_earlier_one(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.pause(5)
+    bucket.pause(1)
+    assert bucket.delay(clock.now) == pytest.approx(5)
+
+
+def test_idle(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.idle
+    bucket.consume()
+    assert not bucket.idle
+    clock.now += 1
+    assert bucket.idle
+
+
+def test_buckets_per_channel_and_tier():
+    limiter = RateLimiter()
+    assert len(limiter.buckets_for("chat.postMessage", "C1")) == 1
+    assert limiter.buckets_for("chat.postMessage", "C1") == limiter.buckets_for("chat.postMessage", "C1")
+    assert limiter.buckets_for("chat.postMessage", "C1") != limiter.buckets_for("chat.postMessage", "C2")
+    assert limiter.buckets_for("users.list") == [limiter._tiers[2]]
+    assert limiter.buckets_for("unknown.method") == []
+
+
+async def test_acquire_waits_out_retry_after():
+    limiter = RateLimiter()
+    await limiter.acquire("chat.postMessage", "C1")
+    limiter.throttle("chat.postMessage", "C1", 0.2)
+    start = time.monotonic()
+    await limiter.acquire("chat.postMessage", "C1")
+    assert 0.15 < time.monotonic() - start < 0.5
+    # other channels aren't held up
+    start = time.monotonic()
+    await limiter.acquire("chat.postMessage", "C2")
+    assert time.monotonic() - start < 0.05
+
+
+async def test_acquire_paces_past_the_burst():
+    limiter = RateLimiter(post_rate=20, post_burst=2)
+    start = time.monotonic()
+    for _ in range(4):
+        await limiter.acquire("chat.postMessage", "C1")
+    # two from the burst, then two at 20/s
+    assert 0.08 < time.monotonic() - start < 0.3
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot_utils.ratelimit import RateLimiter
+from bot_utils.sender import AsyncMessageSender
+from bot_utils.spool import OutboundSpool
+from stubs.local import serve
+from stubs.slack import FakeSlack
+
+
+class Slack():
+    """FakeSlack that records posts and answers 503 for channels in `down`."""
+
+    def __init__(self):
+        self.posts = []
+        self.down = set()
+        self.fake = FakeSlack(on_call=self.on_call)
+        self.fake.app.middlewares.append(self.outage)
+        self.url = None
+
+    def on_call(self, method, params):
+        if method == "chat.postMessage":
+            self.posts.append((params.get("channel"), params.get("text")))
+
+    @web.middleware
+    async def outage(self, request, handler):
+        body = await request.text()
+        if any(f'"{channel}"' in body for channel in self.down):
+            return web.json_response({"ok": False, "error": "service_unavailable"}, status=503)
+        return await handler(request)
+
+    def texts(self, channel):
+        return [text for c, text in self.posts if c == channel]
+
+
+@pytest.fixture
+async def slack():
+    slack = Slack()
+    runner, slack.url = await serve(slack.fake.app)
+    yield slack
+    await runner.cleanup()
+
+
+def sender_for(slack, spool=None, **kwargs):
+    client = AsyncWebClient(token="xoxb-test", base_url=slack.url + "/api/")
+    # Slack's one post per second per channel would make these tests crawl
+    limiter = RateLimiter(post_rate=1000, post_burst=100)
+    return AsyncMessageSender(client, spool=spool, limiter=limiter, max_retries=0, **kwargs)
+
+
+async def test_posts_to_one_channel_in_order(slack):
+    sender = sender_for(slack, workers=4)
+    futures = [await sender.post_message("C1", f"m{i}") for i in range(10)]
+    results = await asyncio.gather(*futures)
+    assert all(result.ok for result in results)
+    assert slack.texts("C1") == [f"m{i}" for i in range(10)]
+    await sender.close()
+
+
+async def test_unreachable_channels_dont_hold_up_the_others(slack, tmp_path):
+    slack.down = {"C1", "C2"}
+    sender = sender_for(slack, OutboundSpool(str(tmp_path / "spool.jsonl")), workers=2, retry_delay=0.1)
+    futures = {channel: [await sender.post_message(channel, f"{channel}-{i}") for i in range(3)]
+               for channel in ("C1", "C2", "C3")}
+    results = {channel: await asyncio.wait_for(asyncio.gather(*fs), 2) for channel, fs in futures.items()}
+    assert [r.error for r in results["C1"]] == ["service_unavailable", "retry_pending", "retry_pending"]
+    assert all(r.transient for r in results["C1"])
+    assert all(r.ok for r in results["C3"])
+
+    slack.down.clear()
+    for _ in range(50):
+        if not sender.spool.pending:
+            break
+        await asyncio.sleep(0.05)
+    assert slack.texts("C1") == ["C1-0", "C1-1", "C1-2"]
+    assert slack.texts("C2") == ["C2-0", "C2-1", "C2-2"]
+    await sender.close()
+
+
+async def test_close_leaves_undelivered_posts_for_the_next_start(slack, tmp_path):
+    path = str(tmp_path / "spool.jsonl")
+    slack.down = {"C1"}
+    sender = sender_for(slack, OutboundSpool(path), retry_delay=10)
+    await asyncio.gather(*[await sender.post_message("C1", f"m{i}") for i in range(2)])
+    await asyncio.wait_for(sender.close(), 2)
+
+    slack.down.clear()
+    sender = sender_for(slack, OutboundSpool(path))
+    assert await sender.replay_spool() == 2
+    await sender.close()
+    assert slack.texts("C1") == ["m0", "m1"]
+
+
+async def test_submit_opens_the_spool_lazily(slack, tmp_path):
+    sender = sender_for(slack, OutboundSpool(str(tmp_path / "spool.jsonl")))
+    result = await asyncio.wait_for(await sender.post_message("C1", "hi"), 2)
+    assert result.ok
+    await sender.close()
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from bot_utils.spool import OutboundSpool
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "spool" / "outbound.jsonl")
+
+
+def post(text, channel="C1"):
+    return {"channel": channel, "text": text}
+
+
+async def test_replays_undelivered_calls_in_order_after_a_crash(path):
+    spool = OutboundSpool(path)
+    assert await spool.open() == []
+    ids = [await spool.add("chat.postMessage", post(f"m{i}")) for i in range(5)]
+    spool.done(ids[1])
+    spool.done(ids[3])
+    await asyncio.sleep(0.05)
+    # crash: nothing closed, and the last write torn halfway
+    spool._task.cancel()
+    spool._file.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": 99, "method": "chat.po')
+
+    replayed = await OutboundSpool(path).open()
+    assert [(spool_id, kwargs["text"]) for spool_id, _, kwargs in replayed] == [
+        (ids[0], "m0"), (ids[2], "m2"), (ids[4], "m4")]
+
+
+async def test_ids_continue_after_reopen(path):
+    spool = OutboundSpool(path)
+    await spool.open()
+    first = await spool.add("chat.postMessage", post("a"))
+    await spool.close()
+
+    spool = OutboundSpool(path)
+    await spool.open()
+    assert await spool.add("chat.postMessage", post("b")) > first
+    await spool.close()
+
+
+async def test_open_rewrites_the_file_with_pending_calls_only(path):
+    spool = OutboundSpool(path)
+    await spool.open()
+    for i in range(10):
+        spool.done(await spool.add("chat.postMessage", post(f"m{i}")))
+    kept = await spool.add("chat.postMessage", post("kept"))
+    await spool.close()
+
+    await OutboundSpool(path).open()
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["id"] for r in records] == [kept]
+
+
+async def test_concurrent_adds_share_a_commit(path):
+    spool = OutboundSpool(path)
+    await spool.open()
+    await asyncio.gather(*(spool.add("chat.postMessage", post(f"m{i}")) for i in range(20)))
+    assert spool.stats["added"] == 20
+    assert spool.stats["commits"] <= 2
+    await spool.close()
+
+
+async def test_compacts_around_a_stuck_entry(path):
+    spool = OutboundSpool(path, compact_bytes=2000)
+    await spool.open()
+    stuck = await spool.add("chat.postMessage", post("stuck"))
+    for i in range(100):
+        spool.done(await spool.add("chat.postMessage", post("x" * 50, channel=f"D{i}")))
+    await spool.close()
+    assert spool.stats["compactions"] > 0
+    assert list(spool.pending) == [stuck]
+    assert [spool_id for spool_id, _, _ in await OutboundSpool(path).open()] == [stuck]
+
+
+async def test_add_requires_open(path):
+    with pytest.raises(RuntimeError):
+        await OutboundSpool(path).add("chat.postMessage", post("a"))
+
+
+async def test_close_answers_callers_of_an_in_flight_commit(path):
+    spool = OutboundSpool(path)
+    await spool.open()
+    write = spool._write
+
+    def slow_write(*args):
+        time.sleep(0.2)
+        write(*args)
+
+    spool._write = slow_write
+    adds = [asyncio.create_task(spool.add("chat.postMessage", post(f"m{i}"))) for i in range(3)]
+    await asyncio.sleep(0.05)
+    await asyncio.wait_for(spool.close(), 2)
+    assert len(await asyncio.wait_for(asyncio.gather(*adds), 1)) == 3
+    assert len(await OutboundSpool(path).open()) == 3